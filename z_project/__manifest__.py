@@ -2,10 +2,10 @@
     "name": "[Custom] Project",
     "summary": "Responsive web client, community-supported",
     "description": "This module contains all the common features of Project.",
-    "version": "1.0.0",
+    "version": "1.0.1",
     'category': 'Base',
     "license": "LGPL-3",
-    "depends": ["web","base","project","mail","portal","hr","hr_timesheet"],
+    "depends": ["web","base","bus","project","mail","portal","hr","hr_timesheet"],
     "data": [
         # security
         'security/ir.model.access.csv',
@@ -20,6 +20,7 @@
         'views/area_regional.xml',
         'views/project_project.xml',
         'views/project_task.xml',
+        'views/task_import.xml',
         'report/views/portal_project.xml',
         'report/views/portal_tasks.xml',
         # default portal
@@ -30,6 +31,7 @@
         # data
         'data/ir_sequence.xml',
         'data/ir_ui_menu.xml',
+        'data/ir_cron.xml',
     ],
     'assets': {
         'web.assets_backend': [
@@ -38,6 +40,9 @@
         ],
         'web.assets_frontend': [
             'z_project/static/src/js/project_project.js',
+            'z_project/static/src/js/portal_timer.js',
+            'z_project/static/src/js/master_data.js',
+            'z_project/static/src/js/autocomplete.js',
         ],
 
     },
@@ -116,6 +116,12 @@ class WebPortal(Portal):
     def portal_dashboard(self, **kwargs):
         values = self._prepare_portal_layout_values()
         values.update(self._prepare_home_portal_values([]))
+        # KPI rows are precomputed (cron + precommit refresh), read them once
+        kpi_rows, kpi_totals = request.env['project.portfolio.kpi'].sudo()._get_dashboard_data()
+        values.update({
+            'kpi_rows': kpi_rows,
+            'kpi_totals': kpi_totals,
+        })
         return request.render('z_project.portal_dashboard', values)
 
     @http.route('/portal/security', type='http', auth='user', website=True, methods=['GET', 'POST'])
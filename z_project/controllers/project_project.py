@@ -2,17 +2,171 @@ from odoo.addons.portal.controllers.portal import CustomerPortal, pager, get_err
 from odoo.exceptions import AccessDenied, AccessError, MissingError, UserError, ValidationError
 from odoo import http, tools, _, SUPERUSER_ID
 from odoo.http import request, Response
+from odoo.tools import SQL
+from .project_task import _resolve_group_labels
+from collections import defaultdict
 from html import unescape
 from urllib.parse import urlencode
 import logging
 import math
 import re
+import json
+import hashlib
+from datetime import date, timedelta
 
 _logger = logging.getLogger(__name__)
 
 
 class PortalProjectControllers(http.Controller):
 
+    def _get_gantt_domains(self, date_from, date_to, search=''):
+        """Domain project dan task yang overlap dengan window [date_from, date_to]."""
+        project_domain = [
+            '|', ('date_start', '=', False), ('date_start', '<=', date_to),
+            '|', ('date', '=', False), ('date', '>=', date_from),
+            '|', ('date_start', '!=', False), ('date', '!=', False),
+        ]
+        if search:
+            project_domain += request.env['project.project']._get_search_document_domain(search)
+        task_domain = [
+            '|', ('z_planned_start_date', '=', False), ('z_planned_start_date', '<=', date_to),
+            '|', ('z_planned_end_date', '=', False), ('z_planned_end_date', '>=', date_from),
+            '|', ('z_planned_start_date', '!=', False), ('z_planned_end_date', '!=', False),
+        ]
+        return project_domain, task_domain
+
+    @http.route('/portal/projects/bulk-confirm', type='http', auth='user', website=True, methods=['POST'])
+    def portal_projects_bulk_confirm(self, project_ids='', **post):
+        """Naikkan status banyak project sekaligus (``project_ids`` dipisah koma)."""
+        try:
+            ids = [int(project_id) for project_id in project_ids.split(',') if project_id.strip()]
+        except ValueError:
+            return request.make_json_response({'success': False, 'error': _('Invalid project selection.')}, status=400)
+        projects = request.env['project.project'].sudo().browse(ids).exists()
+        if not projects:
+            return request.make_json_response({'success': False, 'error': _('No project selected.')}, status=400)
+        advanced = projects._advance_project_status()
+        moved = projects.browse().union(*advanced.values())
+        return request.make_json_response({
+            'success': True,
+            'advanced': {status: records.ids for status, records in advanced.items()},
+            # closed / failed projects have no next status
+            'skipped': (projects - moved).ids,
+        })
+
+    @http.route('/portal/projects/gantt/data', type='http', auth='user', website=True, methods=['GET'])
+    def portal_projects_gantt_data(self, date_from=None, date_to=None, search='', **kw):
+        """Baris gantt (project + task) untuk satu window tanggal, dengan ETag."""
+        try:
+            date_from = date.fromisoformat(date_from) if date_from else date.today() - timedelta(days=90)
+            date_to = date.fromisoformat(date_to) if date_to else date.today() + timedelta(days=90)
+        except ValueError:
+            return request.make_json_response({'error': 'Invalid date window'}, status=400)
+        Project = request.env['project.project'].sudo()
+        Task = request.env['project.task'].sudo()
+        project_domain, task_domain = self._get_gantt_domains(date_from, date_to, search)
+
+        # cheap fingerprint first, the rows are only read when something changed
+        fingerprint = [str(date_from), str(date_to), search]
+        for Model, model_domain in ((Project, project_domain), (Task, task_domain + [('project_id', 'any', project_domain)])):
+            query = Model._search(model_domain)
+            query.order = None
+            request.env.cr.execute(query.select(
+                SQL("MAX(%s)", SQL.identifier(Model._table, 'write_date')), SQL("COUNT(*)"),
+            ))
+            fingerprint.append(repr(request.env.cr.fetchone()))
+        etag = '"%s"' % hashlib.sha1('|'.join(fingerprint).encode()).hexdigest()[:20]
+        headers = [('ETag', etag), ('Cache-Control', 'private, no-cache')]
+        if etag in request.httprequest.headers.get('If-None-Match', ''):
+            return Response(status=304, headers=headers)
+
+        projects = Project.search_read(project_domain, [
+            'name', 'label_tasks', 'date_start', 'date', 'z_actual_start_date', 'z_actual_end_date',
+            'z_progress_project',
+        ], order='date_start, id')
+        tasks = Task.search_read(task_domain + [('project_id', 'in', [p['id'] for p in projects])], [
+            'name', 'project_id', 'parent_id', 'z_planned_start_date', 'z_planned_end_date', 'z_actual_start_date',
+            'z_actual_end_date', 'z_progress_project',
+        ], order='z_planned_start_date, id')
+        rows = []
+        for project in projects:
+            rows.append({
+                'id': f"project-{project['id']}",
+                'name': project['name'] or '',
+                'startTime': str(project['date_start'] or ''),
+                'endTime': str(project['date'] or ''),
+                'actualStartTime': str(project['z_actual_start_date'] or ''),
+                'actualEndTime': str(project['z_actual_end_date'] or ''),
+                'progress': project['z_progress_project'] or 0,
+            })
+        task_ids = {task['id'] for task in tasks}
+        for task in tasks:
+            # a parent outside the window is replaced by the project row
+            if task['parent_id'] and task['parent_id'][0] in task_ids:
+                parent = f"task-{task['parent_id'][0]}"
+            else:
+                parent = f"project-{task['project_id'][0]}"
+            rows.append({
+                'id': f"task-{task['id']}",
+                'parentId': parent,
+                'name': task['name'] or '',
+                'startTime': str(task['z_planned_start_date'] or ''),
+                'endTime': str(task['z_planned_end_date'] or ''),
+                'actualStartTime': str(task['z_actual_start_date'] or ''),
+                'actualEndTime': str(task['z_actual_end_date'] or ''),
+                'progress': task['z_progress_project'] or 0,
+            })
+        payload = json.dumps({'date_from': str(date_from), 'date_to': str(date_to), 'rows': rows})
+        return Response(payload, content_type='application/json', headers=headers)
+
+    def _search_projects_per_group(self, domain, groupby, offsets, order, limit):
+        """Satu halaman project untuk setiap group, dalam satu window query.
+
+        ``offsets`` maps each group key (False for "Undefined") to the offset of
+        its page. Returns ``{group_key: projects}``, the group sizes come from
+        the ``read_group`` that listed the keys. Many2many groups
+        are expanded through their relation table, so a project can be listed
+        in several groups like ``read_group`` does.
+        """
+        Project = request.env['project.project'].sudo()
+        if not offsets:
+            return {}
+        field = Project._fields[groupby]
+        query = Project._search(domain)
+        if field.type == 'many2many':
+            alias = query.make_alias(Project._table, groupby)
+            query.add_join('LEFT JOIN', alias, field.relation, SQL(
+                "%s = %s", SQL.identifier(alias, field.column1), SQL.identifier(Project._table, 'id'),
+            ))
+            group_sql = SQL.identifier(alias, field.column2)
+        else:
+            group_sql = Project._field_to_sql(Project._table, groupby, query)
+        # the ORDER BY may add joins to the query, build it before the FROM clause
+        order_sql = Project._order_to_sql(f'{order}, id', query)
+        pages = SQL(", ").join(SQL("(%s::int, %s::int)", key or None, offset) for key, offset in offsets.items())
+        request.env.cr.execute(SQL("""
+            SELECT ranked.id, ranked.grp
+              FROM (
+                    SELECT %(id)s AS id, %(grp)s AS grp,
+                           ROW_NUMBER() OVER (PARTITION BY %(grp)s ORDER BY %(order)s) AS rn
+                      FROM %(from_clause)s
+                     WHERE %(where_clause)s
+                   ) ranked
+              JOIN (VALUES %(pages)s) AS page(grp, page_offset) ON page.grp IS NOT DISTINCT FROM ranked.grp
+             WHERE ranked.rn > page.page_offset AND ranked.rn <= page.page_offset + %(limit)s
+          ORDER BY ranked.grp, ranked.rn
+        """, id=SQL.identifier(Project._table, 'id'), grp=group_sql, order=order_sql,
+            from_clause=query.from_clause, where_clause=query.where_clause, pages=pages, limit=limit))
+        rows = request.env.cr.fetchall()
+        all_projects = Project.browse([row[0] for row in rows])
+        grouped_ids = defaultdict(list)
+        for project_id, grp in rows:
+            grouped_ids[grp if grp is not None else False].append(project_id)
+        return {
+            key: all_projects.browse(grouped_ids[key]).with_prefetch(all_projects._prefetch_ids)
+            for key in offsets
+        }
+
     @http.route([
         '/portal/projects',
         '/portal/projects/<int:project_id>',
@@ -25,7 +179,6 @@ class PortalProjectControllers(http.Controller):
         step = 3
         group_step = 3
         domain = []
-        data_gantt = []
         url = '/portal/projects'
         if not project_id:
             project_id = kw.get('project_id')
@@ -35,9 +188,10 @@ class PortalProjectControllers(http.Controller):
             function = kw.get('function')
         projects_status = False
         projects_description = False
-        partner_ids = request.env['res.partner'].sudo().search([('is_company','=',True)], order='id asc')
-        employees_ids = request.env['hr.employee'].sudo().search([], order='id asc')
-        tag_ids = request.env['project.tags'].sudo().search([], order='id asc')
+        # customer, employee and tag options are loaded from /portal/master-data,
+        # the employees are only rendered for the project teams table
+        employees_ids = request.env['hr.employee'].sudo().search([], order='id asc') if view_type == 'form' else []
+        master_data_version = request.env['project.portal.master.data']._get_master_data_version()
 
         # ===================== SORT & GROUP CONFIG =====================
         searchbar_sort = {
@@ -59,12 +213,8 @@ class PortalProjectControllers(http.Controller):
         }
         sort_field = searchbar_sort[sortby]['order'] if sortby in searchbar_sort else 'id desc'
         if search:
-            domain += [
-                '|', '|',
-                ('name', 'ilike', search),
-                ('partner_id.name', 'ilike', search),
-                ('user_id.name', 'ilike', search)
-            ]
+            # code, name, customer and project manager, see _compute_search_document
+            domain += request.env['project.project']._get_search_document_domain(search)
 
         # ===================== METHOD POST =====================
         if request.httprequest.method == 'POST':
@@ -74,14 +224,17 @@ class PortalProjectControllers(http.Controller):
                 'csrf_token',
                 'project_id',
                 'function',
+                'portal_m2m_fields',
             ]
             if not model:
                 if 'deleted' in data_dict:
                     data_dict.pop('deleted')
-                ir_model_field_ids = request.env['ir.model.fields'].sudo().search([('model_id.model','=','project.project'),('ttype','=','many2many')], order='id desc')
-                for field_id in ir_model_field_ids:
-                    if field_id.name not in data_dict:
-                        data_dict[field_id.name] = []
+                # an empty multi select is not submitted, it means "none selected",
+                # but only for the selects the submitted form actually rendered
+                rendered = set(data_dict.get('portal_m2m_fields', []))
+                for field_name in request.env['project.project']._get_portal_form_metadata()[0]:
+                    if field_name in rendered and field_name not in data_dict:
+                        data_dict[field_name] = []
             for key in keys_to_remove:
                 data_dict.pop(key, None)
             for key, value in data_dict.items():
@@ -150,7 +303,10 @@ class PortalProjectControllers(http.Controller):
                     elif function and function == 'set_to_draft':
                         project_ids.action_set_to_draft()
                     else:
-                        project_ids.write(data_dict)
+                        # only write what changed, avoids rewriting every m2m and the recomputes it triggers
+                        changed_vals = project_ids._get_portal_changed_vals(data_dict)
+                        if changed_vals:
+                            project_ids.write(changed_vals)
                     return request.redirect(f'/portal/projects/{project_ids.id}?view_type=form')
             elif not project_id and not model:
 
@@ -162,7 +318,12 @@ class PortalProjectControllers(http.Controller):
             domain += [('id','=',project_id)]
         total_projects = request.env['project.project'].sudo().search_count(domain)
         pager_details = pager(url=url, total=total_projects, page=page, step=step, scope=3, url_args={'search': search, 'sortby': sortby, 'groupby': groupby, 'view_type': view_type})
-        projects = request.env['project.project'].sudo().search(domain, offset=pager_details['offset'], limit=step, order=sort_field)
+        if search and not project_id and 'sortby' not in request.params:
+            # no explicit sort chosen, best matches first
+            projects = request.env['project.project'].sudo()._search_ranked(
+                domain, search, offset=pager_details['offset'], limit=step)
+        else:
+            projects = request.env['project.project'].sudo().search(domain, offset=pager_details['offset'], limit=step, order=sort_field)
         if view_type == 'form' and project_id:
             projects = request.env['project.project'].sudo().search(domain, limit=1)
             projects._portal_ensure_token()
@@ -186,6 +347,9 @@ class PortalProjectControllers(http.Controller):
                 limit=None
             )
             group_keys = [g[group_field_name][0] if g[group_field_name] else False for g in read_groups]
+            group_counts = {
+                key: g[f'{group_field_name}_count'] for key, g in zip(group_keys, read_groups)
+            }
             url_args = dict(kw or {})
             for k in list(url_args.keys()):
                 if k.startswith("group_page_"):
@@ -199,27 +363,31 @@ class PortalProjectControllers(http.Controller):
             data_project_on_group = []
             Project = request.env['project.project'].sudo()
             field_obj = Project._fields.get(group_field_name)
+            group_labels = _resolve_group_labels(request.env, 'project.project', group_field_name, group_keys)
+            group_records = False
+            if field_obj and getattr(field_obj, 'comodel_name', None):
+                # one recordset for all keys, so the template reads them in one go
+                group_records = request.env[field_obj.comodel_name].sudo().browse([key for key in group_keys if key])
+            group_pages = {}
             for idx, key in enumerate(group_keys):
-                group_domain = list(domain)
-                if key:
-                    group_domain.append((group_field_name, '=', key))
-                else:
-                    group_domain.append((group_field_name, '=', False))
-                projects_all = Project.search(group_domain, order=sort_field)
-                page_param = f'group_page_{idx}'
                 try:
-                    page_for_group = int(request.httprequest.args.get(page_param, 1))
-                    if page_for_group < 1:
-                        page_for_group = 1
+                    group_pages[key] = max(int(request.httprequest.args.get(f'group_page_{idx}', 1)), 1)
                 except Exception:
-                    page_for_group = 1
+                    group_pages[key] = 1
+            grouped_projects = self._search_projects_per_group(
+                domain, group_field_name,
+                {key: (page_for_group - 1) * group_step for key, page_for_group in group_pages.items()},
+                sort_field, group_step)
+            for idx, key in enumerate(group_keys):
+                page_param = f'group_page_{idx}'
+                page_for_group = group_pages[key]
                 offset = (page_for_group - 1) * group_step
-                projects_paged = projects_all[offset: offset + group_step]
-                total_items = len(projects_all)
+                projects_paged = grouped_projects[key]
+                total_items = group_counts[key]
                 total_pages = (total_items + group_step - 1) // group_step
                 pages = list(range(1, total_pages + 1))
-                if field_obj and getattr(field_obj, 'comodel_name', None):
-                    group_value = request.env[field_obj.comodel_name].sudo().browse(key) if key else 'Undefined'
+                if group_records is not False:
+                    group_value = group_records.browse(key).with_prefetch(group_records._prefetch_ids) if key else 'Undefined'
                 else:
                     group_value = key or 'Undefined'
                 pager_group = {
@@ -232,6 +400,7 @@ class PortalProjectControllers(http.Controller):
                 }
                 data_project_on_group.append({
                     'group_value': group_value,
+                    'group_label': group_labels[key][1],
                     'projects': projects_paged,
                     'pager': pager_group,
                     'group_index': idx,
@@ -240,17 +409,7 @@ class PortalProjectControllers(http.Controller):
         else:
             common_query = urlencode({'search': search, 'sortby': sortby, 'groupby': groupby}, doseq=True)
         # ===================== GANTT =====================
-        if view_type and view_type == 'gantt':
-            for x in projects:
-                data_gantt.append({
-                    "id": x.id,
-                    "startTime": str(x.date_start) if x.date_start else "",
-                    "endTime": str(x.date) if x.date else "",
-                    "actualStartTime": str(x.z_actual_start_date) if x.z_actual_start_date else "",
-                    "actualEndTime": str(x.z_actual_end_date) if x.z_actual_end_date else "",
-                    "name": x.name or "",
-                    "progress": x.z_progress_project or 0,
-                })
+        # rows are loaded per date window from /portal/projects/gantt/data
         values = {
             # filter
             'page_name': 'Projects',
@@ -268,10 +427,8 @@ class PortalProjectControllers(http.Controller):
             'projects': projects,
             'projects_status': projects_status,
             'projects_description': projects_description,
-            'partner_ids': partner_ids,
             'employees_ids': employees_ids,
-            'tag_ids': tag_ids,
-            'data_gantt': data_gantt,
+            'master_data_version': master_data_version,
             'kw': kw,
         }
         return request.render('z_project.portal_project', values)
@@ -3,19 +3,85 @@ from odoo.exceptions import AccessDenied, AccessError, MissingError, UserError,
 from odoo.addons.website.controllers.main import Website
 import math
 import csv
+from collections import defaultdict
 import io
-import base64
 from datetime import datetime, timedelta
 import json
 import logging
 from odoo import http, tools, _, SUPERUSER_ID, fields
-from odoo.http import request, Response
+from odoo.http import request, Response, content_disposition
+from odoo.tools import SQL
+from odoo.tools.lru import LRU
+from odoo.tools.misc import xlsxwriter
+from odoo.addons.z_project.models.portal_master_data import AUTOCOMPLETE_SOURCES
 import re
+import tempfile
+import time
 from html import unescape
+import psycopg2
 import pytz
 
 _logger = logging.getLogger(__name__)
 
+# jumlah task per group yang dimuat sekaligus pada list yang di-group
+GROUP_TASK_LIMIT = 50
+
+
+# label group per (db, lang, model, id): (write_date, label, expiry), least recently used dibuang
+GROUP_LABEL_CACHE_SIZE = 4096
+GROUP_LABEL_CACHE_TTL = 300
+_GROUP_LABEL_CACHE = LRU(GROUP_LABEL_CACHE_SIZE)
+
+
+def _resolve_group_labels(env, model_name, groupby, keys):
+    """Label untuk semua key group sekaligus, ``{key: (group_value_id, group_value_name)}``.
+
+    Relational keys are resolved with one query for their write_date and one
+    read for the records missing from a short-lived cache, so sorting and
+    rendering the groups do not touch the database per key. The cache is
+    bounded, entries past their TTL are refreshed on the next miss.
+    """
+    labels = {}
+    for key in keys:
+        if not key:
+            labels[key] = ('undefined', 'Undefined')
+    field = env[model_name]._fields.get(groupby)
+    comodel_name = getattr(field, 'comodel_name', None)
+    record_ids = list({key for key in keys if key})
+    if not comodel_name:
+        labels.update({key: (str(key), str(key)) for key in record_ids})
+        return labels
+    if not record_ids:
+        return labels
+
+    Comodel = env[comodel_name].sudo().with_context(active_test=False)
+    Comodel.flush_model(['write_date'])
+    env.cr.execute(SQL("SELECT id, write_date FROM %s WHERE id IN %s",
+                       SQL.identifier(Comodel._table), tuple(record_ids)))
+    write_dates = dict(env.cr.fetchall())
+    now = time.monotonic()
+    missing = []
+    for record_id in record_ids:
+        if record_id not in write_dates:
+            # deleted in the meantime
+            labels[record_id] = (str(record_id), str(record_id))
+            continue
+        cached = _GROUP_LABEL_CACHE.get((env.cr.dbname, env.lang, comodel_name, record_id))
+        if cached and cached[0] == write_dates[record_id] and cached[2] > now:
+            labels[record_id] = (str(record_id), cached[1])
+        else:
+            missing.append(record_id)
+    if missing:
+        fnames = [fname for fname in ('z_name', 'name') if fname in Comodel._fields]
+        for record in Comodel.browse(missing):
+            label = next((record[fname] for fname in fnames if record[fname]), None) \
+                or record.display_name or str(record.id)
+            labels[record.id] = (str(record.id), label)
+            _GROUP_LABEL_CACHE[(env.cr.dbname, env.lang, comodel_name, record.id)] = (
+                write_dates[record.id], label, now + GROUP_LABEL_CACHE_TTL,
+            )
+    return labels
+
 
 def _get_user_timezone():
     """Get user timezone, default to Asia/Jakarta"""
@@ -54,6 +120,99 @@ def _format_datetime_to_user_tz(dt_val):
         return dt_val.strftime('%Y-%m-%dT%H:%M') if dt_val else ''
 
 
+# jumlah baris yang diambil per FETCH dari server-side cursor saat export
+EXPORT_FETCH_SIZE = 2000
+EXPORT_XLSX_MAX_ROWS = 1048576
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_export_chunks(registry, query_sql):
+    """Baris hasil ``query_sql`` per chunk, dibaca lewat server-side cursor.
+
+    The generator runs after the request cursor is closed, so it reads on a
+    cursor of its own and never holds more than one chunk in memory.
+    """
+    with registry.cursor() as cr:
+        cr.execute(SQL("DECLARE z_export_cursor NO SCROLL CURSOR FOR %s", query_sql))
+        while True:
+            cr.execute(SQL("FETCH FORWARD %s FROM z_export_cursor", EXPORT_FETCH_SIZE))
+            rows = cr.fetchall()
+            if not rows:
+                break
+            yield rows
+
+
+def _stream_export_csv(registry, query_sql, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for rows in _iter_export_chunks(registry, query_sql):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _stream_export_xlsx(registry, query_sql, header, sheet_name):
+    """XLSX hanya bisa dikirim setelah workbook ditutup.
+
+    Rows are flushed to disk as they are written (``constant_memory``) and
+    the finished file is sent in chunks, so memory stays flat.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        workbook = xlsxwriter.Workbook(tmp, {'constant_memory': True, 'remove_timezone': True})
+        bold = workbook.add_format({'bold': True})
+        sheet, row_index, sheet_count = None, EXPORT_XLSX_MAX_ROWS, 0
+        for rows in _iter_export_chunks(registry, query_sql):
+            for row in rows:
+                if row_index >= EXPORT_XLSX_MAX_ROWS:
+                    sheet_count += 1
+                    sheet = workbook.add_worksheet(f'{sheet_name} {sheet_count}' if sheet_count > 1 else sheet_name)
+                    sheet.write_row(0, 0, header, bold)
+                    row_index = 1
+                sheet.write_row(row_index, 0, row)
+                row_index += 1
+        if sheet is None:
+            workbook.add_worksheet(sheet_name).write_row(0, 0, header, bold)
+        workbook.close()
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _export_join(query, model, alias, fname):
+    """LEFT JOIN ke comodel field many2one ``fname``, return ``(comodel, alias)``."""
+    comodel = model.env[model._fields[fname].comodel_name]
+    coalias = query.make_alias(alias, fname)
+    query.add_join('LEFT JOIN', coalias, comodel._table, SQL(
+        "%s = %s", model._field_to_sql(alias, fname, query), SQL.identifier(coalias, 'id')))
+    return comodel, coalias
+
+
+def _export_selection_sql(model, alias, fname, query):
+    """Label selection langsung di SQL, supaya baris bisa ditulis apa adanya."""
+    column = model._field_to_sql(alias, fname, query)
+    selection = model._fields[fname]._description_selection(model.env)
+    return SQL("CASE %s %s ELSE %s END", column,
+               SQL(" ").join(SQL("WHEN %s THEN %s", value, label) for value, label in selection), column)
+
+
+def _export_datetime_sql(model, alias, fname, query):
+    return SQL("to_char((%s AT TIME ZONE 'UTC') AT TIME ZONE %s, 'YYYY-MM-DD HH24:MI')",
+               model._field_to_sql(alias, fname, query), _get_user_timezone())
+
+
+def _export_date_sql(model, alias, fname, query):
+    return SQL("to_char(%s, 'YYYY-MM-DD')", model._field_to_sql(alias, fname, query))
+
+
 class PortalProjectControllers(http.Controller):
     def _get_task_with_subtasks(self, task):
         result = [task]
@@ -82,46 +241,113 @@ class PortalProjectControllers(http.Controller):
         }
 
     def _get_hierarchical_tasks(self, tasks):
+        """Urutkan task sebagai parent lalu subtask-nya, dalam satu kali jalan.
+
+        Tasks whose parent is not part of ``tasks`` are listed at the top level.
+        """
         if not tasks:
             return []
-        parent_tasks = tasks.filtered(lambda t: not t.parent_id)
+        task_ids = set(tasks.ids)
+        children = defaultdict(list)
+        roots = []
+        for task in tasks:
+            if task.parent_id.id in task_ids:
+                children[task.parent_id.id].append(task)
+            else:
+                roots.append(task)
         hierarchical_tasks = []
-        for parent in parent_tasks:
-            hierarchical_tasks.append(parent)
-            children = tasks.filtered(lambda t: t.parent_id.id == parent.id)
-            hierarchical_tasks.extend(children)
+        stack = list(reversed(roots))
+        while stack:
+            task = stack.pop()
+            hierarchical_tasks.append(task)
+            stack.extend(reversed(children.pop(task.id, [])))
         return hierarchical_tasks
 
+    def _get_task_searchbar_sortings(self):
+        return {
+            'name': {'label': 'Task Name', 'order': 'name'},
+            'project': {'label': 'Project', 'order': 'project_id'},
+            'customer': {'label': 'Customer', 'order': 'partner_id'},
+            'status': {'label': 'Status', 'order': 'z_project_task_state'},
+        }
+
+    def _get_task_searchbar_groupings(self):
+        return {
+            '': {'label': 'None'},
+            'z_master_task_id': {'label': 'Name of Task'},
+            'project_id': {'label': 'Project'},
+            'partner_id': {'label': 'Customer'},
+            'z_project_task_state': {'label': 'Status'},
+            'z_technology_id': {'label': 'Technology'},
+            'z_severity_id': {'label': 'Severity'},
+        }
+
+    def _get_task_list_domain(self, search='', parent_id=None, project_id=None):
+        domain = []
+        if search:
+            # name, project, customer and master task, see _compute_search_document
+            domain += request.env['project.task']._get_search_document_domain(search)
+        if parent_id:
+            domain.append(('parent_id', '=', parent_id))
+        if project_id:
+            domain.append(('project_id', '=', project_id))
+        return domain
+
+    def _search_tasks_per_group(self, domain, groupby, keys, order, limit, offset=0):
+        """Ambil maksimal ``limit`` task per group dengan satu window query.
+
+        Returns ``{group_key: (tasks, total)}`` where ``tasks`` holds the rows
+        ``offset`` to ``offset + limit`` of the group in ``order`` and
+        ``total`` is the size of the whole group.
+        """
+        Task = request.env['project.task'].sudo()
+        if not keys:
+            return {}
+        values = [key for key in keys if key]
+        group_domain = list(domain)
+        if False in keys:
+            group_domain += ['|', (groupby, 'in', values), (groupby, '=', False)]
+        else:
+            group_domain.append((groupby, 'in', values))
+        query = Task._search(group_domain)
+        # the ORDER BY may add joins to the query, build it before the FROM clause
+        order_sql = Task._order_to_sql(f'{order}, id', query)
+        group_sql = Task._field_to_sql(Task._table, groupby, query)
+        request.env.cr.execute(SQL("""
+            SELECT id, grp, total
+              FROM (
+                    SELECT %(id)s AS id, %(grp)s AS grp,
+                           ROW_NUMBER() OVER (PARTITION BY %(grp)s ORDER BY %(order)s) AS rn,
+                           COUNT(*) OVER (PARTITION BY %(grp)s) AS total
+                      FROM %(from_clause)s
+                     WHERE %(where_clause)s
+                   ) ranked
+             WHERE rn > %(offset)s AND rn <= %(stop)s
+          ORDER BY grp, rn
+        """, id=SQL.identifier(Task._table, 'id'), grp=group_sql, order=order_sql,
+            from_clause=query.from_clause, where_clause=query.where_clause, offset=offset, stop=offset + limit))
+        rows = request.env.cr.fetchall()
+        # one recordset for every group so related fields are prefetched together
+        all_tasks = Task.browse([row[0] for row in rows])
+        grouped_ids = defaultdict(list)
+        totals = {}
+        for task_id, grp, total in rows:
+            key = grp if grp is not None else False
+            grouped_ids[key].append(task_id)
+            totals[key] = total
+        return {
+            key: (all_tasks.browse(grouped_ids[key]).with_prefetch(all_tasks._prefetch_ids), totals.get(key, 0))
+            for key in keys
+        }
+
     def _get_common_template_data(self):
+        # the select options themselves are loaded from /portal/master-data
         return {
-            'technologies': request.env['technology.used'].sudo().search([]),
-            'severities': request.env['severity.master'].sudo().search([]),
-            'regionals': request.env['area.regional'].sudo().search([]),
-            'master_tasks': request.env['task.master'].sudo().search([]),
-            'employees': request.env['hr.employee'].sudo().search([]),
+            'master_data_version': request.env['project.portal.master.data']._get_master_data_version(),
         }
 
     def _get_group_display_name(self, groupby, key):
-        if not key:
-            return 'undefined', 'Undefined'
-        try:
-            Task = request.env['project.task'].sudo()
-            group_field = Task._fields.get(groupby)
-            if hasattr(group_field, 'comodel_name') and group_field.comodel_name:
-                rec = request.env[group_field.comodel_name].sudo().browse(key)
-                if rec and rec.exists():
-                    group_value_id = str(rec.id)
-                    if hasattr(rec, 'z_name') and rec.z_name:
-                        group_value_name = rec.z_name
-                    elif hasattr(rec, 'name') and rec.name:
-                        group_value_name = rec.name
-                    else:
-                        group_value_name = rec.display_name or str(key)
-                    return group_value_id, group_value_name
-            return str(key), str(key)
-        except Exception as e:
-            _logger.warning(f"Error resolving group value for {groupby}={key}: {e}")
-            return str(key) if key else 'undefined', str(key) if key else 'Undefined'
+        return _resolve_group_labels(request.env, 'project.task', groupby, [key])[key]
 
     @http.route([
         '/portal/tasks',
@@ -136,21 +362,10 @@ class PortalProjectControllers(http.Controller):
                                   project_id=None, **kw):
         Task = request.env['project.task'].sudo()
         step = 20
-        searchbar_sortings = {
-            'name': {'label': 'Task Name', 'order': 'name'},
-            'project': {'label': 'Project', 'order': 'project_id'},
-            'customer': {'label': 'Customer', 'order': 'partner_id'},
-            'status': {'label': 'Status', 'order': 'z_project_task_state'},
-        }
-        searchbar_groupings = {
-            '': {'label': 'None'},
-            'z_master_task_id': {'label': 'Name of Task'},
-            'project_id': {'label': 'Project'},
-            'partner_id': {'label': 'Customer'},
-            'z_project_task_state': {'label': 'Status'},
-            'z_technology_id': {'label': 'Technology'},
-            'z_severity_id': {'label': 'Severity'},
-        }
+        searchbar_sortings = self._get_task_searchbar_sortings()
+        searchbar_groupings = self._get_task_searchbar_groupings()
+        if groupby not in searchbar_groupings:
+            groupby = ''
         common_data = self._get_common_template_data()
         if not project_id and kw.get('project_id'):
             try:
@@ -301,207 +516,9 @@ class PortalProjectControllers(http.Controller):
                 _logger.error("Error creating task: %s", str(e))
                 redirect_url = f'/portal/tasks/parent/{parent_id}' if parent_id else '/portal/tasks'
                 return request.redirect(f'{redirect_url}?mode=new&error=' + tools.html_escape(str(e)))
-        # PATCH: Timer pause/resume logic fix
-        if request.httprequest.path.endswith('/timer'):
-            if request.httprequest.method == 'POST':
-                try:
-                    task = Task.browse(task_id).exists()
-                    if not task:
-                        return Response(json.dumps({'success': False, 'error': 'Task not found'}),
-                                        content_type='application/json')
-                    action = request.httprequest.form.get('action')
-                    employee = request.env['hr.employee'].sudo().search([('user_id', '=', request.env.user.id)],
-                                                                        limit=1)
-                    if not employee:
-                        return Response(json.dumps({'success': False, 'error': 'Employee not found'}),
-                                        content_type='application/json')
-                    # Timer start/resume update status to in_progress
-                    if action in ['start', 'resume']:
-                        if task.z_project_task_state == 'new':
-                            task.z_project_task_state = 'in_progress'
-                    if action == 'start':
-                        open_line = request.env['account.analytic.line'].sudo().search([
-                            ('task_id', '=', task.id),
-                            ('employee_id', '=', employee.id),
-                            ('z_timesheet_end_date', '=', False),
-                        ], limit=1)
-                        if open_line:
-                            if hasattr(open_line, 'z_is_paused') and open_line.z_is_paused:
-                                open_line.z_is_paused = False
-                                start_at = fields.Datetime.to_string(open_line.z_timesheet_start_date)
-                                return Response(json.dumps({
-                                    'success': True,
-                                    'start_at': start_at,
-                                    'message': 'Timer resumed',
-                                    'action': 'resumed'
-                                }), content_type='application/json')
-                            else:
-                                start_at = fields.Datetime.to_string(open_line.z_timesheet_start_date)
-                                return Response(json.dumps({
-                                    'success': True,
-                                    'start_at': start_at,
-                                    'message': 'Timer already running',
-                                    'action': 'already_running'
-                                }), content_type='application/json')
-                        now_utc = fields.Datetime.now()
-                        line_vals = {
-                            'task_id': task.id,
-                            'project_id': task.project_id.id if task.project_id else False,
-                            'employee_id': employee.id,
-                            'name': f'Timer started for {task.name}',
-                            'z_timesheet_start_date': now_utc,
-                            'date': fields.Date.context_today(request.env.user),
-                        }
-                        if hasattr(request.env['account.analytic.line'], 'z_is_paused'):
-                            line_vals['z_is_paused'] = False
-                        # Add pause/resume history
-                        if hasattr(request.env['account.analytic.line'], 'z_pause_resume_list'):
-                            line_vals['z_pause_resume_list'] = []
-                        new_line = request.env['account.analytic.line'].sudo().create(line_vals)
-                        start_at = fields.Datetime.to_string(now_utc)
-                        return Response(json.dumps({
-                            'success': True,
-                            'start_at': start_at,
-                            'message': 'Timer started',
-                            'action': 'started',
-                            'timesheet_id': new_line.id
-                        }), content_type='application/json')
-                    elif action == 'pause':
-                        open_line = request.env['account.analytic.line'].sudo().search([
-                            ('task_id', '=', task.id),
-                            ('employee_id', '=', employee.id),
-                            ('z_timesheet_end_date', '=', False),
-                        ], order='id desc', limit=1)
-                        if not open_line:
-                            return Response(json.dumps({'success': False, 'error': 'No running timer found'}),
-                                            content_type='application/json')
-                        if hasattr(open_line, 'z_is_paused'):
-                            open_line.z_is_paused = True
-                            now_utc = fields.Datetime.now()
-                            duration = (now_utc - open_line.z_timesheet_start_date).total_seconds() / 3600
-                            pause_list = getattr(open_line, 'z_pause_resume_list', [])
-                            pause_list.append({'pause_at': now_utc})
-                            if hasattr(open_line, 'z_pause_resume_list'):
-                                open_line.z_pause_resume_list = pause_list
-                            if hasattr(open_line, 'z_accumulated_time'):
-                                open_line.z_accumulated_time = duration
-                            else:
-                                open_line.unit_amount = round(duration, 2)
-                        return Response(json.dumps({
-                            'success': True,
-                            'message': 'Timer paused',
-                            'action': 'paused'
-                        }), content_type='application/json')
-                    elif action == 'resume':
-                        open_line = request.env['account.analytic.line'].sudo().search([
-                            ('task_id', '=', task.id),
-                            ('employee_id', '=', employee.id),
-                            ('z_timesheet_end_date', '=', False),
-                        ], order='id desc', limit=1)
-                        if not open_line:
-                            return Response(json.dumps({'success': False, 'error': 'No paused timer found'}),
-                                            content_type='application/json')
-                        if hasattr(open_line, 'z_is_paused'):
-                            open_line.z_is_paused = False
-                            pause_list = getattr(open_line, 'z_pause_resume_list', [])
-                            pause_list.append({'resume_at': fields.Datetime.now()})
-                            if hasattr(open_line, 'z_pause_resume_list'):
-                                open_line.z_pause_resume_list = pause_list
-                        start_at = fields.Datetime.to_string(open_line.z_timesheet_start_date)
-                        return Response(json.dumps({
-                            'success': True,
-                            'start_at': start_at,
-                            'message': 'Timer resumed',
-                            'action': 'resumed'
-                        }), content_type='application/json')
-                    elif action == 'stop':
-                        desc = request.httprequest.form.get('description', '').strip()
-                        if not desc:
-                            return Response(
-                                json.dumps({'success': False, 'error': 'Description is required when stopping timer'}),
-                                content_type='application/json')
-                        open_line = request.env['account.analytic.line'].sudo().search([
-                            ('task_id', '=', task.id),
-                            ('employee_id', '=', employee.id),
-                            ('z_timesheet_end_date', '=', False),
-                        ], order='id desc', limit=1)
-                        if not open_line:
-                            return Response(json.dumps({'success': False, 'error': 'No running timer found'}),
-                                            content_type='application/json')
-                        end_time_utc = fields.Datetime.now()
-                        start_time = open_line.z_timesheet_start_date
-                        duration = 0
-                        if start_time and end_time_utc:
-                            pause_list = getattr(open_line, 'z_pause_resume_list', [])
-                            if pause_list:
-                                last_resume = start_time
-                                total_active = 0
-                                for entry in pause_list:
-                                    pause_at = entry.get('pause_at')
-                                    resume_at = entry.get('resume_at')
-                                    if pause_at and last_resume:
-                                        total_active += (pause_at - last_resume).total_seconds()
-                                    if resume_at:
-                                        last_resume = resume_at
-                                if last_resume:
-                                    total_active += (end_time_utc - last_resume).total_seconds()
-                                duration = total_active / 3600
-                            else:
-                                duration = (end_time_utc - start_time).total_seconds() / 3600
-                            if hasattr(open_line, 'z_accumulated_time') and open_line.z_accumulated_time:
-                                duration = open_line.z_accumulated_time
-                            open_line.unit_amount = round(duration, 2)
-                        update_vals = {
-                            'z_timesheet_end_date': end_time_utc,
-                            'name': desc,
-                        }
-                        if hasattr(open_line, 'z_is_paused'):
-                            update_vals['z_is_paused'] = False
-                        if hasattr(open_line, 'z_pause_resume_list'):
-                            update_vals['z_pause_resume_list'] = getattr(open_line, 'z_pause_resume_list', [])
-                        open_line.write(update_vals)
-                        attachment_ids = []
-                        if hasattr(request, 'httprequest') and request.httprequest.files:
-                            files = request.httprequest.files
-                            for file_key in files:
-                                if file_key == 'attachments':
-                                    file_list = files.getlist(file_key)
-                                    for uploaded_file in file_list:
-                                        if uploaded_file and uploaded_file.filename:
-                                            try:
-                                                file_content = uploaded_file.read()
-                                                attachment = request.env['ir.attachment'].sudo().create({
-                                                    'name': uploaded_file.filename,
-                                                    'type': 'binary',
-                                                    'datas': base64.b64encode(file_content),
-                                                    'res_model': 'account.analytic.line',
-                                                    'res_id': open_line.id,
-                                                    'mimetype': uploaded_file.content_type or 'application/octet-stream',
-                                                    'description': f'Timer attachment for timesheet {open_line.id}',
-                                                    'public': False,
-                                                })
-                                                attachment_ids.append(attachment.id)
-                                            except Exception as e:
-                                                _logger.error("Error uploading attachment: %s", str(e))
-                        if attachment_ids:
-                            open_line.message_post(
-                                body=f"Timer stopped with {len(attachment_ids)} attachment(s)",
-                                attachment_ids=attachment_ids
-                            )
-                        return Response(json.dumps({
-                            'success': True,
-                            'attachments_count': len(attachment_ids),
-                            'timesheet_id': open_line.id,
-                            'duration': round(duration, 2),
-                            'action': 'stopped'
-                        }), content_type='application/json')
-                    else:
-                        return Response(json.dumps({'success': False, 'error': 'Invalid action'}),
-                                        content_type='application/json')
-                except Exception as e:
-                    _logger.error('Timer error: %s', e)
-                    return Response(json.dumps({'success': False, 'error': str(e)}),
-                                    content_type='application/json')
+        # Timer actions are handled by portal_task_timer
+        if request.httprequest.path.endswith('/timer') and request.httprequest.method == 'POST':
+            return self.portal_task_timer(task_id, **request.httprequest.form.to_dict())
 
         # EDIT VIEW
         if task_id and '/task/' in request.httprequest.path:
@@ -514,24 +531,22 @@ class PortalProjectControllers(http.Controller):
             status_label = self._get_status_label(task.z_project_task_state)
             button_visibility = self._get_task_buttons_visibility(task)
 
-            employee = request.env['hr.employee'].sudo().search([('user_id', '=', request.env.user.id)], limit=1)
+            employee = request.env['hr.employee']._get_employee_by_user()
             active_timer_start = ''
+            active_timer_segment_start = ''
+            active_timer_active_duration = 0.0
             active_timer_running = False
             active_timer_paused = False
             master = task.z_master_task_id.z_name if task.z_master_task_id else ''
 
             if employee:
-                open_line = request.env['account.analytic.line'].sudo().search([
-                    ('task_id', '=', task.id),
-                    ('employee_id', '=', employee.id),
-                    ('z_timesheet_end_date', '=', False),
-                ], order='id desc', limit=1)
+                open_line = request.env['account.analytic.line']._get_running_timers(employee.id, task.id)[:1]
                 if open_line and open_line.z_timesheet_start_date:
                     active_timer_start = fields.Datetime.to_string(open_line.z_timesheet_start_date)
                     active_timer_running = True
-                    # FIXED: Check for pause state if field exists
-                    if hasattr(open_line, 'z_is_paused'):
-                        active_timer_paused = open_line.z_is_paused
+                    active_timer_paused = open_line.z_is_paused
+                    active_timer_segment_start = fields.Datetime.to_string(open_line.z_segment_start_date) or ''
+                    active_timer_active_duration = open_line.z_active_duration
 
             subtasks = Task.search([('parent_id', '=', task.id)])
 
@@ -555,6 +570,8 @@ class PortalProjectControllers(http.Controller):
                 'project_id': project_id,
                 'project': project,
                 'active_timer_start': active_timer_start,
+                'active_timer_segment_start': active_timer_segment_start,
+                'active_timer_active_duration': active_timer_active_duration,
                 'active_timer_running': active_timer_running,
                 'active_timer_paused': active_timer_paused,
                 **common_data
@@ -611,19 +628,7 @@ class PortalProjectControllers(http.Controller):
             return request.render('z_project.portal_task_page', values)
 
         # LIST VIEW (same as before but with project context)
-        domain = []
-        if search:
-            domain += [
-                '|', '|', '|',
-                ('name', 'ilike', search),
-                ('project_id.name', 'ilike', search),
-                ('partner_id.name', 'ilike', search),
-                ('z_master_task_id.z_name', 'ilike', search),
-            ]
-        if parent_id:
-            domain.append(('parent_id', '=', parent_id))
-        if project_id:
-            domain.append(('project_id', '=', project_id))
+        domain = self._get_task_list_domain(search, parent_id, project_id)
 
         url = '/portal/tasks' if not parent_id else f'/portal/tasks/parent/{parent_id}'
         sort_field = searchbar_sortings.get(sortby, {}).get('order', 'name')
@@ -649,11 +654,13 @@ class PortalProjectControllers(http.Controller):
                 else:
                     group_keys.append(False)
 
+            group_labels = _resolve_group_labels(request.env, 'project.task', groupby, group_keys)
+
             def sort_group_key(key):
                 if key is False:
                     return (1, 'Undefined')
                 else:
-                    _, display_name = self._get_group_display_name(groupby, key)
+                    _, display_name = group_labels[key]
                     return (0, display_name)
 
             group_keys.sort(key=sort_group_key)
@@ -667,18 +674,14 @@ class PortalProjectControllers(http.Controller):
 
             group_keys_on_page = group_keys[pager_details['offset']:pager_details['offset'] + step]
             data_task_on_group = []
+            grouped_tasks = self._search_tasks_per_group(domain, groupby, group_keys_on_page, sort_field,
+                                                         GROUP_TASK_LIMIT)
 
             for key in group_keys_on_page:
-                group_domain = list(domain)
-                if key:
-                    group_domain.append((groupby, '=', key))
-                else:
-                    group_domain.append((groupby, '=', False))
-
-                group_tasks = Task.search(group_domain, order=sort_field)
+                group_tasks, group_total = grouped_tasks[key]
                 hierarchical_tasks = self._get_hierarchical_tasks(group_tasks)
 
-                group_value_id, group_value_name = self._get_group_display_name(groupby, key)
+                group_value_id, group_value_name = group_labels[key]
 
                 data_task_on_group.append({
                     'group_value': None,
@@ -686,6 +689,8 @@ class PortalProjectControllers(http.Controller):
                     'group_value_name': group_value_name,
                     'group_key': key,
                     'tasks': hierarchical_tasks,
+                    'total': group_total,
+                    'next_offset': len(group_tasks) if group_total > len(group_tasks) else False,
                 })
 
             tasks = data_task_on_group
@@ -699,7 +704,11 @@ class PortalProjectControllers(http.Controller):
                 url_args={'search': search, 'sortby': sortby, 'groupby': groupby, 'parent_id': parent_id,
                           'project_id': project_id}
             )
-            tasks = Task.search(domain, offset=pager_details_out['offset'], limit=step, order=sort_field)
+            if search and 'sortby' not in request.params:
+                # no explicit sort chosen, best matches first
+                tasks = Task._search_ranked(domain, search, offset=pager_details_out['offset'], limit=step)
+            else:
+                tasks = Task.search(domain, offset=pager_details_out['offset'], limit=step, order=sort_field)
 
         page_name = 'Tasks'
         if parent_id and parent_task:
@@ -749,220 +758,414 @@ class PortalProjectControllers(http.Controller):
         desc = unescape(desc)
         return "\n".join([line.rstrip() for line in desc.splitlines()]).strip()
 
-    # FIXED: Enhanced timer with PAUSE/RESUME functionality
-    @http.route('/portal/task/<int:task_id>/timer', type='http', auth='user', website=True, methods=['POST'])
-    def portal_task_timer(self, task_id, **post):
+    @http.route('/portal/tasks/group/more', type='http', auth='user', website=True, methods=['GET'])
+    def portal_tasks_group_more(self, groupby='', key='', offset=0, search='', sortby='name', parent_id=None,
+                                project_id=None, collapse_target='', **kw):
+        """Baris berikutnya dari satu group pada list task yang di-group."""
+        Task = request.env['project.task'].sudo()
+        # only the groupings offered by the list page
+        if not groupby or groupby not in self._get_task_searchbar_groupings():
+            return request.make_json_response({'html': '', 'next_offset': False, 'remaining': 0})
+        group_field = Task._fields[groupby]
         try:
-            task = request.env['project.task'].sudo().browse(task_id).exists()
-            if not task:
-                return Response(json.dumps({'success': False, 'error': 'Task not found'}),
-                                content_type='application/json')
-
-            action = post.get('action')
-            employee = request.env['hr.employee'].sudo().search([('user_id', '=', request.env.user.id)], limit=1)
-
-            if not employee:
-                return Response(json.dumps({'success': False, 'error': 'Employee not found'}),
-                                content_type='application/json')
-
-            if action == 'start':
-                # Check if there's already a running timer
-                open_line = request.env['account.analytic.line'].sudo().search([
-                    ('task_id', '=', task.id),
-                    ('employee_id', '=', employee.id),
-                    ('z_timesheet_end_date', '=', False),
-                ], limit=1)
-
-                if open_line:
-                    # If timer exists but is paused, resume it
-                    if hasattr(open_line, 'z_is_paused') and open_line.z_is_paused:
-                        open_line.z_is_paused = False
-                        start_at = fields.Datetime.to_string(open_line.z_timesheet_start_date)
-                        return Response(json.dumps({
-                            'success': True,
-                            'start_at': start_at,
-                            'message': 'Timer resumed',
-                            'action': 'resumed'
-                        }), content_type='application/json')
-                    else:
-                        # Timer already running
-                        start_at = fields.Datetime.to_string(open_line.z_timesheet_start_date)
-                        return Response(json.dumps({
-                            'success': True,
-                            'start_at': start_at,
-                            'message': 'Timer already running',
-                            'action': 'already_running'
-                        }), content_type='application/json')
-
-                # Create new timer
-                now_utc = fields.Datetime.now()
-                line_vals = {
-                    'task_id': task.id,
-                    'project_id': task.project_id.id if task.project_id else False,
-                    'employee_id': employee.id,
-                    'name': f'Timer started for {task.name}',
-                    'z_timesheet_start_date': now_utc,
-                    'date': fields.Date.context_today(request.env.user),
+            offset = max(int(offset), 0)
+            parent_id = int(parent_id) if parent_id else None
+            project_id = int(project_id) if project_id else None
+            if key in ('', 'undefined', 'False'):
+                key = False
+            elif group_field.type == 'many2one':
+                key = int(key)
+        except (ValueError, TypeError):
+            return request.make_json_response({'html': '', 'next_offset': False, 'remaining': 0})
+
+        domain = self._get_task_list_domain(search, parent_id, project_id)
+        sort_field = self._get_task_searchbar_sortings().get(sortby, {}).get('order', 'name')
+        group_tasks, group_total = self._search_tasks_per_group(
+            domain, groupby, [key], sort_field, GROUP_TASK_LIMIT, offset=offset)[key]
+        html = request.env['ir.ui.view']._render_template('z_project.portal_task_group_rows', {
+            'group_tasks': self._get_hierarchical_tasks(group_tasks),
+            'collapse_target': collapse_target,
+            'row_class': 'show',
+        })
+        next_offset = offset + len(group_tasks)
+        return request.make_json_response({
+            'html': str(html),
+            'next_offset': next_offset if group_total > next_offset else False,
+            'remaining': max(group_total - next_offset, 0),
+        })
+
+    @http.route('/portal/master-data', type='http', auth='user', website=True, methods=['GET'])
+    def portal_master_data(self, **kw):
+        """Snapshot master data untuk select di portal, bisa di-cache browser lewat ETag."""
+        version, payload = request.env['project.portal.master.data']._get_master_data_payload()
+        etag = f'"{version}"'
+        headers = [('ETag', etag), ('Cache-Control', 'private, no-cache')]
+        if etag in request.httprequest.headers.get('If-None-Match', ''):
+            return Response(status=304, headers=headers)
+        return Response(payload, content_type='application/json', headers=headers)
+
+    @http.route('/portal/autocomplete/<string:kind>', type='http', auth='user', website=True, methods=['GET'])
+    def portal_autocomplete(self, kind, term='', page=1, **kw):
+        """Lookup untuk select2 (format ``results`` + ``pagination``)."""
+        MasterData = request.env['project.portal.master.data']
+        if kind not in AUTOCOMPLETE_SOURCES:
+            return request.make_json_response({'results': [], 'pagination': {'more': False}}, status=404)
+        try:
+            page = int(page)
+        except (ValueError, TypeError):
+            page = 1
+        rows, more = MasterData._autocomplete(kind, term, page)
+        return request.make_json_response({
+            'results': [{'id': record_id, 'text': label or ''} for record_id, label in rows],
+            'pagination': {'more': more},
+        })
+
+    def _export_response(self, query_sql, header, export_format, filename):
+        registry = request.env.registry
+        if export_format == 'xlsx':
+            body = _stream_export_xlsx(registry, query_sql, header, filename.title())
+            content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        else:
+            export_format = 'csv'
+            body = _stream_export_csv(registry, query_sql, header)
+            content_type = 'text/csv; charset=utf-8'
+        stamp = fields.Date.context_today(request.env.user).strftime('%Y%m%d')
+        return Response(body, headers=[
+            ('Content-Type', content_type),
+            ('Content-Disposition', content_disposition(f'{filename}_{stamp}.{export_format}')),
+            ('Cache-Control', 'no-store'),
+            # let nginx pass the chunks through as they come
+            ('X-Accel-Buffering', 'no'),
+        ], direct_passthrough=True)
+
+    @http.route('/portal/tasks/export', type='http', auth='user', website=True, methods=['GET'])
+    def portal_tasks_export(self, export_format='csv', search='', sortby='name', groupby='', key=None,
+                            parent_id=None, project_id=None, **kw):
+        """Export task sesuai pencarian / filter group yang sedang tampil, di-stream per chunk."""
+        Task = request.env['project.task'].sudo()
+        try:
+            parent_id = int(parent_id) if parent_id else None
+            project_id = int(project_id) if project_id else None
+        except (ValueError, TypeError):
+            parent_id = project_id = None
+        domain = self._get_task_list_domain(search, parent_id, project_id)
+        group_field = Task._fields.get(groupby) if groupby in self._get_task_searchbar_groupings() else None
+        if group_field and key is not None:
+            if key in ('', 'undefined', 'False'):
+                domain.append((groupby, '=', False))
+            else:
+                try:
+                    domain.append((groupby, '=', int(key) if group_field.type == 'many2one' else key))
+                except ValueError:
+                    domain.append((groupby, '=', False))
+        sort_field = self._get_task_searchbar_sortings().get(sortby, {}).get('order', 'name')
+
+        query = Task._search(domain)
+        table = Task._table
+        query.order = Task._order_to_sql(f'{sort_field}, id', query)
+        Project, project_alias = _export_join(query, Task, table, 'project_id')
+        Partner, partner_alias = _export_join(query, Task, table, 'partner_id')
+        Master, master_alias = _export_join(query, Task, table, 'z_master_task_id')
+        Parent, parent_alias = _export_join(query, Task, table, 'parent_id')
+        query_sql = query.select(
+            SQL.identifier(table, 'id'),
+            Task._field_to_sql(table, 'name', query),
+            Master._field_to_sql(master_alias, 'z_name', query),
+            Project._field_to_sql(project_alias, 'name', query),
+            Partner._field_to_sql(partner_alias, 'name', query),
+            Parent._field_to_sql(parent_alias, 'name', query),
+            _export_selection_sql(Task, table, 'z_project_task_state', query),
+            _export_date_sql(Task, table, 'z_planned_start_date', query),
+            _export_date_sql(Task, table, 'z_planned_end_date', query),
+            _export_date_sql(Task, table, 'z_actual_start_date', query),
+            _export_date_sql(Task, table, 'z_actual_end_date', query),
+            _export_datetime_sql(Task, table, 'date_deadline', query),
+        )
+        header = [
+            'ID', 'Task Code', 'Name of Task', 'Project', 'Customer', 'Parent Task', 'Status',
+            'Planned Start', 'Planned End', 'Actual Start', 'Actual End', 'Deadline',
+        ]
+        return self._export_response(query_sql, header, export_format, 'tasks')
+
+    @http.route('/portal/timesheets/export', type='http', auth='user', website=True, methods=['GET'])
+    def portal_timesheets_export(self, export_format='csv', project_id=None, date_from=None, date_to=None, **kw):
+        """Export timesheet per project dan/atau periode (``date_from``/``date_to`` ISO), di-stream per chunk."""
+        Line = request.env['account.analytic.line'].sudo()
+        domain = [('project_id', '!=', False)]
+        try:
+            if project_id:
+                domain.append(('project_id', '=', int(project_id)))
+            if date_from:
+                domain.append(('date', '>=', fields.Date.to_date(date_from)))
+            if date_to:
+                domain.append(('date', '<=', fields.Date.to_date(date_to)))
+        except ValueError:
+            return request.make_json_response({'error': _('Invalid export filter.')}, status=400)
+
+        query = Line._search(domain)
+        table = Line._table
+        query.order = SQL("%s, %s", SQL.identifier(table, 'date'), SQL.identifier(table, 'id'))
+        Project, project_alias = _export_join(query, Line, table, 'project_id')
+        Task, task_alias = _export_join(query, Line, table, 'task_id')
+        Employee, employee_alias = _export_join(query, Line, table, 'employee_id')
+        query_sql = query.select(
+            SQL.identifier(table, 'id'),
+            _export_date_sql(Line, table, 'date', query),
+            Project._field_to_sql(project_alias, 'name', query),
+            Task._field_to_sql(task_alias, 'name', query),
+            Employee._field_to_sql(employee_alias, 'name', query),
+            Line._field_to_sql(table, 'name', query),
+            _export_datetime_sql(Line, table, 'z_timesheet_start_date', query),
+            _export_datetime_sql(Line, table, 'z_timesheet_end_date', query),
+            Line._field_to_sql(table, 'unit_amount', query),
+            _export_selection_sql(Line, table, 'z_state', query),
+        )
+        header = ['ID', 'Date', 'Project', 'Task', 'Employee', 'Description', 'Start', 'End', 'Duration', 'Status']
+        return self._export_response(query_sql, header, export_format, 'timesheets')
+
+    @http.route('/portal/tasks/import', type='http', auth='user', website=True, methods=['POST'])
+    def portal_tasks_import(self, import_type='tasks', batch_size=None, **post):
+        """Import CSV task/subtask atau timesheet, file dibaca per baris langsung dari upload."""
+        upload = request.httprequest.files.get('file')
+        if not upload or not upload.filename:
+            return request.make_json_response({'success': False, 'error': _('No file uploaded.')}, status=400)
+        try:
+            batch_size = int(batch_size) if batch_size else None
+        except ValueError:
+            batch_size = None
+        employee = request.env['hr.employee']._get_employee_by_user()
+        if import_type == 'timesheets' and not employee:
+            return request.make_json_response(
+                {'success': False, 'error': _('No employee is linked to your user.')}, status=403)
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            # like the timer routes, portal users only book their own timesheets
+            result = request.env['project.task.import'].sudo()._import_stream(
+                stream, import_type, batch_size, employee=employee or None)
+        except (UserError, UnicodeDecodeError, csv.Error) as e:
+            return request.make_json_response({'success': False, 'error': str(e)}, status=400)
+        return request.make_json_response({
+            'success': True,
+            'created': result['created'],
+            'errors': [{'row': row, 'message': message} for row, message in result['errors']],
+        })
+
+    def _apply_timer_action(self, task, employee, action, open_line, description='', files=None):
+        """Jalankan satu aksi timer (start/pause/resume/stop) dan kembalikan hasilnya sebagai dict.
+
+        ``open_line`` is the running timesheet line of ``employee`` on ``task``
+        (possibly empty), so callers can resolve it for many tasks at once.
+        """
+        Line = request.env['account.analytic.line'].sudo()
+        if action == 'start':
+            if open_line:
+                # If timer exists but is paused, resume it
+                if open_line.z_is_paused:
+                    open_line.action_resume_timer()
+                    return {
+                        'success': True,
+                        'start_at': fields.Datetime.to_string(open_line.z_timesheet_start_date),
+                        'segment_start': fields.Datetime.to_string(open_line.z_segment_start_date),
+                        'active_duration': open_line.z_active_duration,
+                        'message': 'Timer resumed',
+                        'action': 'resumed'
+                    }
+                # Timer already running
+                return {
+                    'success': True,
+                    'start_at': fields.Datetime.to_string(open_line.z_timesheet_start_date),
+                    'segment_start': fields.Datetime.to_string(open_line.z_segment_start_date),
+                    'active_duration': open_line.z_active_duration,
+                    'message': 'Timer already running',
+                    'action': 'already_running'
                 }
 
-                if hasattr(request.env['account.analytic.line'], 'z_is_paused'):
-                    line_vals['z_is_paused'] = False
-
-                new_line = request.env['account.analytic.line'].sudo().create(line_vals)
-                start_at = fields.Datetime.to_string(now_utc)
-                return Response(json.dumps({
+            # Create new timer
+            now_utc = fields.Datetime.now()
+            line_vals = {
+                'task_id': task.id,
+                'project_id': task.project_id.id if task.project_id else False,
+                'employee_id': employee.id,
+                'name': f'Timer started for {task.name}',
+                'z_timesheet_start_date': now_utc,
+                'date': fields.Date.context_today(request.env.user),
+                'z_is_paused': False,
+            }
+            try:
+                with request.env.cr.savepoint():
+                    new_line = Line.create(line_vals)
+            except psycopg2.errors.UniqueViolation:
+                # another request started the same timer in the meantime
+                open_line = Line._get_running_timers(employee.id, task.id)[:1]
+                return {
                     'success': True,
-                    'start_at': start_at,
-                    'message': 'Timer started',
-                    'action': 'started',
-                    'timesheet_id': new_line.id
-                }), content_type='application/json')
-
-            elif action == 'pause':
-                # FIXED: PAUSE functionality
-                open_line = request.env['account.analytic.line'].sudo().search([
-                    ('task_id', '=', task.id),
-                    ('employee_id', '=', employee.id),
-                    ('z_timesheet_end_date', '=', False),
-                ], order='id desc', limit=1)
-
-                if not open_line:
-                    return Response(json.dumps({'success': False, 'error': 'No running timer found'}),
-                                    content_type='application/json')
+                    'start_at': fields.Datetime.to_string(open_line.z_timesheet_start_date),
+                    'segment_start': fields.Datetime.to_string(open_line.z_segment_start_date),
+                    'active_duration': open_line.z_active_duration,
+                    'message': 'Timer already running',
+                    'action': 'already_running'
+                }
+            return {
+                'success': True,
+                'start_at': fields.Datetime.to_string(now_utc),
+                'message': 'Timer started',
+                'action': 'started',
+                'timesheet_id': new_line.id
+            }
 
-                # Mark as paused if field exists
-                if hasattr(open_line, 'z_is_paused'):
-                    open_line.z_is_paused = True
+        elif action == 'pause':
+            if not open_line:
+                return {'success': False, 'error': 'No running timer found'}
+            # Close the running segment, the active time so far is kept on the line
+            if not open_line.action_pause_timer():
+                return {'success': False, 'error': 'Timer is already paused'}
+            return {
+                'success': True,
+                'message': 'Timer paused',
+                'action': 'paused'
+            }
 
-                    # Calculate and store accumulated time so far
-                    if open_line.z_timesheet_start_date:
-                        now_utc = fields.Datetime.now()
-                        duration = (now_utc - open_line.z_timesheet_start_date).total_seconds() / 3600
+        elif action == 'resume':
+            if not open_line:
+                return {'success': False, 'error': 'No paused timer found'}
+            if not open_line.action_resume_timer():
+                return {'success': False, 'error': 'Timer is not paused'}
+            return {
+                'success': True,
+                'start_at': fields.Datetime.to_string(open_line.z_timesheet_start_date),
+                'segment_start': fields.Datetime.to_string(open_line.z_segment_start_date),
+                'active_duration': open_line.z_active_duration,
+                'message': 'Timer resumed',
+                'action': 'resumed'
+            }
 
-                        # Store accumulated time in a custom field if it exists
-                        if hasattr(open_line, 'z_accumulated_time'):
-                            open_line.z_accumulated_time = duration
-                        else:
-                            open_line.unit_amount = round(duration, 2)
+        elif action == 'stop':
+            desc = (description or '').strip()
+            if not desc:
+                return {'success': False, 'error': 'Description is required when stopping timer'}
+            if not open_line:
+                return {'success': False, 'error': 'No running timer found'}
+
+            # Effective duration excludes the paused intervals
+            duration = open_line.action_stop_timer(desc)
+
+            # Handle file attachments, streamed to the filestore chunk by chunk
+            attachment_ids = []
+            attachment_errors = []
+            Attachment = request.env['ir.attachment'].sudo()
+            for uploaded_file in files or []:
+                if uploaded_file and uploaded_file.filename:
+                    try:
+                        with request.env.cr.savepoint():
+                            attachment = Attachment._create_from_upload_stream(
+                                uploaded_file.stream, uploaded_file.filename, 'account.analytic.line', open_line.id,
+                                mimetype=uploaded_file.content_type,
+                                description=f'Timer attachment for timesheet {open_line.id}',
+                            )
+                        if attachment.id not in attachment_ids:
+                            attachment_ids.append(attachment.id)
+                    except UserError as e:
+                        attachment_errors.append(str(e))
+                    except Exception as e:
+                        _logger.error("Error uploading attachment: %s", str(e))
+
+            if attachment_ids:
+                open_line.message_post(
+                    body=f"Timer stopped with {len(attachment_ids)} attachment(s)",
+                    attachment_ids=attachment_ids
+                )
+
+            return {
+                'success': True,
+                'attachments_count': len(attachment_ids),
+                'attachment_errors': attachment_errors,
+                'timesheet_id': open_line.id,
+                'duration': round(duration, 2),
+                'action': 'stopped'
+            }
 
-                return Response(json.dumps({
-                    'success': True,
-                    'message': 'Timer paused',
-                    'action': 'paused'
-                }), content_type='application/json')
-
-            elif action == 'resume':
-                # FIXED: RESUME functionality
-                open_line = request.env['account.analytic.line'].sudo().search([
-                    ('task_id', '=', task.id),
-                    ('employee_id', '=', employee.id),
-                    ('z_timesheet_end_date', '=', False),
-                ], order='id desc', limit=1)
-
-                if not open_line:
-                    return Response(json.dumps({'success': False, 'error': 'No paused timer found'}),
-                                    content_type='application/json')
+        return {'success': False, 'error': 'Invalid action'}
 
-                # Resume the timer
-                if hasattr(open_line, 'z_is_paused'):
-                    open_line.z_is_paused = False
+    # FIXED: Enhanced timer with PAUSE/RESUME functionality
+    @http.route('/portal/task/<int:task_id>/timer', type='http', auth='user', website=True, methods=['POST'])
+    def portal_task_timer(self, task_id, **post):
+        try:
+            task = request.env['project.task'].sudo().browse(task_id).exists()
+            if not task:
+                return request.make_json_response({'success': False, 'error': 'Task not found'})
 
-                start_at = fields.Datetime.to_string(open_line.z_timesheet_start_date)
-                return Response(json.dumps({
-                    'success': True,
-                    'start_at': start_at,
-                    'message': 'Timer resumed',
-                    'action': 'resumed'
-                }), content_type='application/json')
-
-            elif action == 'stop':
-                desc = post.get('description', '').strip()
-
-                if not desc:
-                    return Response(
-                        json.dumps({'success': False, 'error': 'Description is required when stopping timer'}),
-                        content_type='application/json')
-
-                open_line = request.env['account.analytic.line'].sudo().search([
-                    ('task_id', '=', task.id),
-                    ('employee_id', '=', employee.id),
-                    ('z_timesheet_end_date', '=', False),
-                ], order='id desc', limit=1)
-
-                if not open_line:
-                    return Response(json.dumps({'success': False, 'error': 'No running timer found'}),
-                                    content_type='application/json')
+            employee = request.env['hr.employee']._get_employee_by_user()
+            if not employee:
+                return request.make_json_response({'success': False, 'error': 'Employee not found'})
 
-                end_time_utc = fields.Datetime.now()
-                start_time = open_line.z_timesheet_start_date
+            open_line = request.env['account.analytic.line']._get_running_timers(employee.id, task.id)[:1]
+            result = self._apply_timer_action(
+                task, employee, post.get('action'), open_line,
+                description=post.get('description', ''),
+                files=request.httprequest.files.getlist('attachments'),
+            )
+            return request.make_json_response(result)
 
-                # Calculate final duration
-                if start_time and end_time_utc:
-                    duration = (end_time_utc - start_time).total_seconds() / 3600
+        except Exception as e:
+            _logger.error('Timer error: %s', e)
+            return request.make_json_response({'success': False, 'error': str(e)})
 
-                    # If there was accumulated time from pauses, add it
-                    if hasattr(open_line, 'z_accumulated_time') and open_line.z_accumulated_time:
-                        duration = open_line.z_accumulated_time
+    @http.route('/portal/tasks/timer/batch', type='http', auth='user', website=True, methods=['POST'])
+    def portal_task_timer_batch(self, **post):
+        """Beberapa aksi timer sekaligus, misal pause task A lalu start task B.
 
-                    open_line.unit_amount = round(duration, 2)
+        ``operations`` is a JSON list of ``{"task_id", "action", "description"}``
+        applied in order within the request transaction. Every operation runs in
+        its own savepoint so one failure does not undo the others.
+        """
+        try:
+            operations = json.loads(post.get('operations') or '[]')
+            if not isinstance(operations, list):
+                raise ValueError()
+        except ValueError:
+            return request.make_json_response({'success': False, 'error': 'Invalid operations'})
 
-                update_vals = {
-                    'z_timesheet_end_date': end_time_utc,
-                    'name': desc,
-                }
+        employee = request.env['hr.employee']._get_employee_by_user()
+        if not employee:
+            return request.make_json_response({'success': False, 'error': 'Employee not found'})
 
-                if hasattr(open_line, 'z_is_paused'):
-                    update_vals['z_is_paused'] = False
-
-                open_line.write(update_vals)
-
-                # Handle file attachments
-                attachment_ids = []
-                if hasattr(request, 'httprequest') and request.httprequest.files:
-                    files = request.httprequest.files
-                    for file_key in files:
-                        if file_key == 'attachments':
-                            file_list = files.getlist(file_key)
-                            for uploaded_file in file_list:
-                                if uploaded_file and uploaded_file.filename:
-                                    try:
-                                        file_content = uploaded_file.read()
-                                        attachment = request.env['ir.attachment'].sudo().create({
-                                            'name': uploaded_file.filename,
-                                            'type': 'binary',
-                                            'datas': base64.b64encode(file_content),
-                                            'res_model': 'account.analytic.line',
-                                            'res_id': open_line.id,
-                                            'mimetype': uploaded_file.content_type or 'application/octet-stream',
-                                            'description': f'Timer attachment for timesheet {open_line.id}',
-                                            'public': False,
-                                        })
-                                        attachment_ids.append(attachment.id)
-                                    except Exception as e:
-                                        _logger.error("Error uploading attachment: %s", str(e))
-
-                if attachment_ids:
-                    open_line.message_post(
-                        body=f"Timer stopped with {len(attachment_ids)} attachment(s)",
-                        attachment_ids=attachment_ids
+        Task = request.env['project.task'].sudo()
+        Line = request.env['account.analytic.line'].sudo()
+        operation_task_ids = []
+        for operation in operations:
+            try:
+                operation_task_ids.append(int(operation.get('task_id')))
+            except (AttributeError, TypeError, ValueError):
+                operation_task_ids.append(False)
+        tasks = Task.browse({task_id for task_id in operation_task_ids if task_id}).exists()
+        open_lines = {}
+        for line in Line._get_running_timers(employee.id, tasks.ids):
+            open_lines.setdefault(line.task_id.id, line)
+
+        results = []
+        for operation, task_id in zip(operations, operation_task_ids):
+            task = tasks.filtered(lambda x: x.id == task_id)
+            if not task:
+                results.append({'success': False, 'error': 'Task not found', 'task_id': task_id})
+                continue
+            try:
+                with request.env.cr.savepoint():
+                    result = self._apply_timer_action(
+                        task, employee, operation.get('action'), open_lines.get(task.id, Line),
+                        description=operation.get('description', ''),
                     )
-
-                return Response(json.dumps({
-                    'success': True,
-                    'attachments_count': len(attachment_ids),
-                    'timesheet_id': open_line.id,
-                    'duration': round(duration, 2),
-                    'action': 'stopped'
-                }), content_type='application/json')
-
-            else:
-                return Response(json.dumps({'success': False, 'error': 'Invalid action'}),
-                                content_type='application/json')
-
-        except Exception as e:
-            _logger.error('Timer error: %s', e)
-            return Response(json.dumps({'success': False, 'error': str(e)}),
-                            content_type='application/json')
+            except Exception as e:
+                _logger.error('Timer error: %s', e)
+                result = {'success': False, 'error': str(e)}
+            if result.get('action') == 'started':
+                open_lines[task.id] = Line.browse(result['timesheet_id'])
+            elif result.get('action') == 'stopped':
+                open_lines.pop(task.id, None)
+            results.append(dict(result, task_id=task.id))
+        return request.make_json_response({
+            'success': all(result['success'] for result in results),
+            'results': results,
+        })
 
     # Rest of the methods remain the same...
     @http.route('/portal/task/<int:task_id>/timesheet', type='http', auth='user', website=True, methods=['POST'])
@@ -0,0 +1,35 @@
+def migrate(cr, version):
+    """Buat segmen timer untuk line yang masih jalan / pause sebelum ada segmen.
+
+    Legacy lines only know their start date and the total paused seconds, so
+    the active time is put in one synthetic segment starting after the pauses:
+    open for a running line, closed at the pause start for a paused one.
+    """
+    if not version:
+        return
+    cr.execute("""
+        SELECT line.id,
+               line.z_timesheet_start_date + make_interval(secs => COALESCE(line.z_pause_duration, 0)),
+               line.z_is_paused,
+               line.z_pause_start_time
+          FROM account_analytic_line line
+         WHERE line.z_timesheet_start_date IS NOT NULL
+           AND line.z_timesheet_end_date IS NULL
+           AND NOT EXISTS (SELECT 1 FROM account_analytic_line_segment segment
+                            WHERE segment.z_timesheet_id = line.id)
+    """)
+    for line_id, segment_start, paused, pause_start in cr.fetchall():
+        segment_end = max(pause_start or segment_start, segment_start) if paused else None
+        duration = (segment_end - segment_start).total_seconds() if segment_end else 0.0
+        cr.execute("""
+            INSERT INTO account_analytic_line_segment
+                (z_timesheet_id, z_start_date, z_end_date, z_duration,
+                 create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, 1, now() at time zone 'UTC', 1, now() at time zone 'UTC')
+        """, [line_id, segment_start, segment_end, duration])
+        cr.execute("""
+            UPDATE account_analytic_line
+               SET z_active_duration = %s,
+                   z_segment_start_date = %s
+             WHERE id = %s
+        """, [duration, None if paused else segment_start, line_id])
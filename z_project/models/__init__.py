@@ -1,3 +1,6 @@
+from . import master_tracking
+from . import portal_master_data
+from . import search_document
 from . import project_project
 from . import project_task
 from . import area_regional
@@ -6,3 +9,9 @@ from . import severity_master
 from . import task_master
 from . import res_users
 from . import correction_timesheet
+from . import hr_employee
+from . import project_tags
+from . import ir_attachment
+from . import res_partner
+from . import portfolio_kpi
+from . import task_import
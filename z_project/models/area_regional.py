@@ -5,7 +5,7 @@ class AreaRegional(models.Model):
 
     _name = "area.regional"
     _description = "Area Regional"
-    _inherit = ["mail.thread","mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin","project.portal.master.data.mixin","mail.thread","mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id desc"
 
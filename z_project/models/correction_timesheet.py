@@ -53,7 +53,7 @@ class CorrectionTimesheetLine(models.Model):
 
     _name = "correction.timesheet.line"
     _description = "CR Lines"
-    _inherit = ["mail.thread","mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin","mail.thread","mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id asc"
 
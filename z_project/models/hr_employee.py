@@ -0,0 +1,66 @@
+from odoo import api, fields, models, tools
+
+USER_EMPLOYEE_VERSION_PARAM = 'z_project.user_employee_version'
+
+
+class HrEmployee(models.Model):
+
+    _name = "hr.employee"
+    _inherit = ["hr.employee", "project.portal.master.data.mixin"]
+
+    # portal autocomplete (project.portal.master.data._autocomplete)
+    name = fields.Char(index='trigram')
+
+    @api.model
+    def _get_user_employee_map(self):
+        """Mapping user_id -> employee_id, cached per registry.
+
+        The cache is keyed on a version counter that only changes when an
+        employee gains, loses or changes its user, so other caches are left
+        alone and every worker picks up the change.
+        """
+        version = self.env['project.portal.master.data']._get_version_counter(USER_EMPLOYEE_VERSION_PARAM)
+        return self._get_user_employee_map_cached(version)
+
+    @tools.ormcache('version')
+    def _get_user_employee_map_cached(self, version):
+        employee_map = {}
+        # the most recent employee of a user wins
+        for employee in self.sudo().search_read([('user_id', '!=', False)], ['user_id'], order='id desc'):
+            employee_map.setdefault(employee['user_id'][0], employee['id'])
+        return employee_map
+
+    def _bump_user_employee_version(self):
+        self.env['project.portal.master.data']._bump_version_counter(USER_EMPLOYEE_VERSION_PARAM)
+
+    @api.model
+    def _get_employee_ids_by_user(self, user_ids):
+        """Batched lookup, returns {user_id: employee_id} for users that have an employee."""
+        employee_map = self._get_user_employee_map()
+        return {user_id: employee_map[user_id] for user_id in user_ids if user_id in employee_map}
+
+    @api.model
+    def _get_employee_by_user(self, user_id=None):
+        """Employee (sudo) of ``user_id``, the current user by default."""
+        user_id = user_id or self.env.uid
+        return self.sudo().browse(self._get_user_employee_map().get(user_id, []))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        employees = super().create(vals_list)
+        if any(vals.get('user_id') for vals in vals_list):
+            self._bump_user_employee_version()
+        return employees
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'user_id' in vals or 'active' in vals:
+            self._bump_user_employee_version()
+        return res
+
+    def unlink(self):
+        has_user = any(self.mapped('user_id'))
+        res = super().unlink()
+        if has_user:
+            self._bump_user_employee_version()
+        return res
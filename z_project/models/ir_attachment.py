@@ -0,0 +1,117 @@
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+
+from odoo import api, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+DEFAULT_UPLOAD_LIMIT = 25 * 1024 * 1024
+
+
+class IrAttachment(models.Model):
+    _inherit = "ir.attachment"
+
+    @api.model
+    def _get_upload_size_limit(self):
+        """Batas ukuran upload (bytes), diatur lewat ``z_project.attachment_max_size``."""
+        limit = self.env['ir.config_parameter'].sudo().get_param('z_project.attachment_max_size')
+        try:
+            return int(limit) if limit else DEFAULT_UPLOAD_LIMIT
+        except ValueError:
+            return DEFAULT_UPLOAD_LIMIT
+
+    @api.model
+    def _create_from_upload_stream(self, stream, name, res_model, res_id, mimetype=None, description=False):
+        """Simpan file upload ke filestore per chunk dan buat attachment-nya.
+
+        The payload is hashed while it is copied, so it is never held in
+        memory as a whole (nor base64 encoded). An attachment with the same
+        checksum on the same record is reused instead of duplicated. Only the
+        ``file`` location is streamed, other ``ir_attachment.location`` values
+        go through the regular ``raw`` create.
+        """
+        limit = self._get_upload_size_limit()
+        if self._storage() != 'file':
+            raw = stream.read(limit + 1)
+            if len(raw) > limit:
+                raise UserError(_("File %(name)s is larger than %(limit)s bytes.", name=name, limit=limit))
+            checksum = self._compute_checksum(raw)
+            existing = self._find_upload_duplicate(checksum, res_model, res_id)
+            if existing:
+                return existing
+            return self.create(dict(self._prepare_upload_values(name, res_model, res_id, mimetype, description),
+                                    raw=raw))
+
+        sha = hashlib.sha1()
+        size = 0
+        filestore = self._filestore()
+        os.makedirs(filestore, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.upload-', dir=filestore)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > limit:
+                        raise UserError(_("File %(name)s is larger than %(limit)s bytes.", name=name, limit=limit))
+                    sha.update(chunk)
+                    tmp.write(chunk)
+            checksum = sha.hexdigest()
+            existing = self._find_upload_duplicate(checksum, res_model, res_id)
+            if existing:
+                return existing
+            fname = f'{checksum[:2]}/{checksum}'
+            full_path = self._full_path(fname)
+            if os.path.exists(full_path):
+                # same content already in the filestore, keep that copy
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(tmp_path, full_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        # the file is left to the GC if the attachment is not committed
+        self.env.cr.postrollback.add(functools.partial(self._mark_for_gc, fname))
+        try:
+            attachment = self.create(self._prepare_upload_values(name, res_model, res_id, mimetype, description))
+            # create() drops store_fname / file_size / checksum from its values
+            attachment.flush_recordset()
+            self.env.cr.execute(SQL(
+                "UPDATE ir_attachment SET store_fname = %s, file_size = %s, checksum = %s WHERE id = %s",
+                fname, size, checksum, attachment.id,
+            ))
+        except Exception:
+            self._mark_for_gc(fname)
+            raise
+        attachment.invalidate_recordset(['store_fname', 'file_size', 'checksum', 'datas', 'raw', 'db_datas'])
+        return attachment
+
+    @api.model
+    def _find_upload_duplicate(self, checksum, res_model, res_id):
+        return self.search([
+            ('checksum', '=', checksum),
+            ('res_model', '=', res_model),
+            ('res_id', '=', res_id),
+        ], limit=1)
+
+    @api.model
+    def _prepare_upload_values(self, name, res_model, res_id, mimetype, description):
+        return {
+            'name': name,
+            'type': 'binary',
+            'res_model': res_model,
+            'res_id': res_id,
+            'mimetype': mimetype or 'application/octet-stream',
+            'description': description,
+            'public': False,
+        }
@@ -0,0 +1,38 @@
+from odoo import api, models
+
+
+class ProjectMasterTrackingMixin(models.AbstractModel):
+    """Switch tracking chatter master data lewat context ``z_skip_master_tracking``.
+
+    Heavy batch jobs set the key so creating or writing master records does
+    not log "created" messages, subscribe followers or track values. Put the
+    mixin before ``mail.thread`` in ``_inherit`` so it wraps its overrides.
+    ``project.task`` and ``account.analytic.line`` honour the key in their
+    ``create`` through ``_get_master_tracking_context``.
+    """
+    _name = "project.master.tracking.mixin"
+    _description = "Master Data Tracking Switch"
+
+    def _get_master_tracking_context(self):
+        if not self.env.context.get('z_skip_master_tracking'):
+            return {}
+        return {
+            'tracking_disable': True,
+            'mail_create_nolog': True,
+            'mail_create_nosubscribe': True,
+            'mail_notrack': True,
+        }
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        context = self._get_master_tracking_context()
+        if context:
+            records = super(ProjectMasterTrackingMixin, self.with_context(**context)).create(vals_list)
+            return records.with_env(self.env)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        context = self._get_master_tracking_context()
+        if context:
+            return super(ProjectMasterTrackingMixin, self.with_context(**context)).write(vals)
+        return super().write(vals)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+
+from odoo import api, models, tools
+from odoo.tools import SQL
+from odoo.tools.sql import escape_psql
+
+# key payload: (model, domain, field label, order)
+MASTER_DATA_SOURCES = {
+    'technologies': ('technology.used', [], 'z_name', None),
+    'severities': ('severity.master', [], 'z_name', None),
+    'regionals': ('area.regional', [], 'z_name', None),
+    'master_tasks': ('task.master', [], 'z_name', None),
+    'employees': ('hr.employee', [], 'name', 'id asc'),
+    'tags': ('project.tags', [], 'name', 'id asc'),
+}
+
+# key autocomplete: (model, domain, field yang dicari), field-nya punya index trigram
+AUTOCOMPLETE_SOURCES = {
+    'projects': ('project.project', [], 'name'),
+    'employees': ('hr.employee', [], 'name'),
+    'master_tasks': ('task.master', [], 'z_name'),
+    'customers': ('res.partner', [('is_company', '=', True)], 'complete_name'),
+}
+AUTOCOMPLETE_PAGE_SIZE = 30
+# below this length a trigram index cannot help, only prefixes are matched
+AUTOCOMPLETE_MIN_CONTAINS = 3
+MASTER_DATA_VERSION_PARAM = 'z_project.master_data_version'
+
+
+class ProjectPortalMasterDataMixin(models.AbstractModel):
+    """Naikkan versi master data portal setiap record sumber berubah.
+
+    Inherited by the models of ``MASTER_DATA_SOURCES``; only writes on the
+    label field or ``active`` change the snapshot.
+    """
+    _name = "project.portal.master.data.mixin"
+    _description = "Portal Master Data Source"
+
+    def _get_portal_master_data_fields(self):
+        return {fname for model_name, _domain, fname, _order in MASTER_DATA_SOURCES.values()
+                if model_name == self._name} | {'active'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['project.portal.master.data']._bump_master_data_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if self._get_portal_master_data_fields() & set(vals):
+            self.env['project.portal.master.data']._bump_master_data_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['project.portal.master.data']._bump_master_data_version()
+        return res
+
+
+class ProjectPortalMasterData(models.AbstractModel):
+    _name = "project.portal.master.data"
+    _description = "Portal Master Data"
+
+    @api.model
+    def _get_version_counter(self, key):
+        """Token versi counter ``key``, dipakai sebagai key ormcache.
+
+        Counters live in ``ir_config_parameter`` and are read and bumped in
+        SQL, so bumping one never clears the registry caches the way
+        ``set_param`` would; they are never read through ``get_param``. The
+        token includes the row's ``xmin`` so a value cached by a transaction
+        that rolled back is never reused once another one bumps the counter.
+        """
+        self.env.cr.execute(SQL(
+            "SELECT value || ':' || xmin::text FROM ir_config_parameter WHERE key = %s", key,
+        ))
+        row = self.env.cr.fetchone()
+        return row[0] if row else '0'
+
+    @api.model
+    def _bump_version_counter(self, key):
+        self.env.cr.execute(SQL("""
+            INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+            VALUES (%(key)s, '1', %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (key) DO UPDATE SET
+                value = (ir_config_parameter.value::bigint + 1)::text,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, key=key, uid=self.env.uid))
+
+    @api.model
+    def _get_master_data_version(self):
+        """Versi snapshot master data, dinaikkan setiap ada create/write/unlink.
+
+        The counter is bumped by ``project.portal.master.data.mixin``; checking
+        it costs one indexed lookup whatever the size of the source tables.
+        """
+        counter = self._get_version_counter(MASTER_DATA_VERSION_PARAM)
+        return hashlib.sha1(f'{counter}{self.env.lang}'.encode()).hexdigest()[:16]
+
+    @api.model
+    def _bump_master_data_version(self):
+        self._bump_version_counter(MASTER_DATA_VERSION_PARAM)
+
+    @api.model
+    def _get_master_data_payload(self):
+        """(version, JSON payload) snapshot master data untuk select di portal."""
+        version = self._get_master_data_version()
+        return version, self._get_master_data_json(version, self.env.lang)
+
+    @tools.ormcache('version', 'lang')
+    def _get_master_data_json(self, version, lang):
+        data = {}
+        for key, (model_name, domain, fname, order) in MASTER_DATA_SOURCES.items():
+            records = self.env[model_name].sudo().with_context(lang=lang).search_read(
+                domain, [fname], order=order)
+            data[key] = [{'id': record['id'], 'name': record[fname] or ''} for record in records]
+        return json.dumps({'version': version, 'data': data})
+
+    @api.model
+    def _autocomplete(self, kind, term='', page=1):
+        """Satu halaman hasil autocomplete, ``([(id, label)], has_more)``.
+
+        Prefix matches are ranked before other matches. Terms shorter than
+        ``AUTOCOMPLETE_MIN_CONTAINS`` only match prefixes.
+        """
+        model_name, domain, fname = AUTOCOMPLETE_SOURCES[kind]
+        Model = self.env[model_name].sudo()
+        term = (term or '').strip()
+        domain = list(domain)
+        prefix = f'{escape_psql(term)}%'
+        if term and len(term) < AUTOCOMPLETE_MIN_CONTAINS:
+            domain.append((fname, '=ilike', prefix))
+        elif term:
+            domain.append((fname, 'ilike', term))
+        query = Model._search(domain)
+        field_sql = Model._field_to_sql(Model._table, fname, query)
+        id_sql = SQL.identifier(Model._table, 'id')
+        if term:
+            query.order = SQL("%s ILIKE %s DESC, %s, %s", field_sql, prefix, field_sql, id_sql)
+        else:
+            query.order = SQL("%s, %s", field_sql, id_sql)
+        query.limit = AUTOCOMPLETE_PAGE_SIZE + 1
+        query.offset = (max(page, 1) - 1) * AUTOCOMPLETE_PAGE_SIZE
+        self.env.cr.execute(query.select(id_sql, field_sql))
+        rows = self.env.cr.fetchall()
+        return rows[:AUTOCOMPLETE_PAGE_SIZE], len(rows) > AUTOCOMPLETE_PAGE_SIZE
@@ -0,0 +1,238 @@
+import functools
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
+
+# task states that no longer count as overdue
+KPI_CLOSED_TASK_STATES = ('done', 'cancel')
+KPI_POSTCOMMIT_KEY = 'z_project.portfolio_kpi.dirty'
+# write_date watermark of the last cron run, read and written in SQL
+KPI_WATERMARK_PARAM = 'z_project.portfolio_kpi.checked_at'
+# transactions still open when the cron ran commit rows older than its watermark
+KPI_WATERMARK_OVERLAP = timedelta(minutes=15)
+
+
+class ProjectPortfolioKpi(models.Model):
+    _name = "project.portfolio.kpi"
+    _description = "Project Portfolio KPI"
+    _rec_name = "z_project_id"
+    _order = "z_overdue_task_count desc, z_project_id"
+
+    z_project_id = fields.Many2one('project.project', string='Project', required=True, index=True, ondelete='cascade')
+    z_task_count = fields.Integer(string='Tasks', readonly=True)
+    z_overdue_task_count = fields.Integer(string='Overdue Tasks', readonly=True)
+    z_progress = fields.Float(string='Progress', readonly=True)
+    z_mandays_budget = fields.Float(string='Budget Mandays', readonly=True)
+    z_actual_mandays = fields.Float(string='Actual Mandays', readonly=True)
+    z_invoice_plan_count = fields.Integer(string='Invoice Plans', readonly=True)
+    z_invoice_plan_total = fields.Float(string='Invoice Plan Total', readonly=True)
+    z_refreshed_at = fields.Datetime(string='Refreshed At', readonly=True)
+
+    _sql_constraints = [
+        ('project_uniq', 'unique(z_project_id)', 'A project can only have one KPI row.'),
+    ]
+
+    def init(self):
+        # the cron looks up the rows written since its last run
+        create_index(self.env.cr, 'account_analytic_line_z_write_date_index', 'account_analytic_line',
+                     ['write_date'])
+        create_index(self.env.cr, 'project_task_z_write_date_index', 'project_task', ['write_date'])
+
+    @api.model
+    def _mark_projects_dirty(self, projects):
+        """Catat project yang KPI-nya dihitung ulang sekali setelah commit.
+
+        All projects touched in the transaction are refreshed together by a
+        single postcommit hook, in its own short transaction, so the writers
+        never lock the shared KPI rows and savepoint flushes do not trigger
+        a refresh each.
+        """
+        project_ids = {id_ for id_ in projects._origin.ids if id_}
+        if not project_ids:
+            return
+        dirty = self.env.cr.postcommit.data.get(KPI_POSTCOMMIT_KEY)
+        if dirty is None:
+            dirty = self.env.cr.postcommit.data[KPI_POSTCOMMIT_KEY] = set()
+            self.env.cr.postcommit.add(functools.partial(self._refresh_dirty_projects, dirty))
+        dirty.update(project_ids)
+
+    @api.model
+    def _mark_projects_stale(self, projects):
+        """Tandai baris KPI supaya diambil cron berikutnya, tanpa menghitung ulang."""
+        project_ids = [id_ for id_ in projects._origin.ids if id_]
+        if project_ids:
+            self.env.cr.execute(SQL(
+                "UPDATE project_portfolio_kpi SET z_refreshed_at = NULL WHERE z_project_id = ANY(%s)",
+                project_ids,
+            ))
+
+    @api.model
+    def _refresh_dirty_projects(self, project_ids):
+        if not project_ids:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                self.with_env(self.env(cr=cr, su=True))._refresh_kpi(list(project_ids))
+        except Exception:
+            # e.g. a concurrent refresh of the same rows, the cron catches up
+            _logger.info("KPI refresh of projects %s left to the cron", sorted(project_ids), exc_info=True)
+
+    @api.model
+    def _cron_refresh_kpi(self):
+        """Refresh only the stale rows.
+
+        A row is stale when it is missing or flagged, when its project was
+        written after the last refresh, or when one of its tasks, timesheets
+        (which never refresh KPI rows themselves, the timer endpoints stay
+        free of it) or invoice plans was written, or a task deadline passed,
+        since the previous run. Those lookups go through write_date indexes
+        from a watermark, so their cost follows the rows changed in between,
+        not the total volume.
+        """
+        self.env.flush_all()
+        cr = self.env.cr
+        cr.execute(SQL("""
+            DELETE FROM project_portfolio_kpi kpi
+                  USING project_project project
+                  WHERE project.id = kpi.z_project_id AND NOT project.active
+        """))
+        now = cr.now()
+        cr.execute(SQL("SELECT value FROM ir_config_parameter WHERE key = %s", KPI_WATERMARK_PARAM))
+        row = cr.fetchone()
+        since = fields.Datetime.to_datetime(row[0]) - KPI_WATERMARK_OVERLAP if row else None
+        if since is None:
+            # first run, every row is checked
+            changed = SQL("SELECT id FROM project_project")
+        else:
+            changed = SQL("""
+                SELECT task.project_id
+                  FROM account_analytic_line line
+                  JOIN project_task task ON task.id = line.task_id
+                 WHERE line.write_date > %(since)s
+             UNION
+                SELECT project_id FROM project_task WHERE write_date > %(since)s
+             UNION
+                SELECT project_id
+                  FROM project_task
+                 WHERE active AND date_deadline > %(since)s AND date_deadline <= %(now)s
+                   AND z_project_task_state NOT IN %(closed)s
+             UNION
+                SELECT z_project_id FROM project_project_invoice_plan WHERE write_date > %(since)s
+            """, since=since, now=now, closed=KPI_CLOSED_TASK_STATES)
+        cr.execute(SQL("""
+            SELECT project.id
+              FROM project_project project
+         LEFT JOIN project_portfolio_kpi kpi ON kpi.z_project_id = project.id
+             WHERE project.active
+               AND (kpi.id IS NULL
+                    OR kpi.z_refreshed_at IS NULL
+                    OR kpi.z_refreshed_at < project.write_date
+                    OR project.id IN (%s))
+        """, changed))
+        project_ids = [row[0] for row in cr.fetchall()]
+        if project_ids:
+            self._refresh_kpi(project_ids)
+        cr.execute(SQL("""
+            INSERT INTO ir_config_parameter (key, value, create_uid, create_date, write_uid, write_date)
+            VALUES (%(key)s, %(value)s, %(uid)s, %(now)s, %(uid)s, %(now)s)
+            ON CONFLICT (key) DO UPDATE SET
+                value = EXCLUDED.value,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, key=KPI_WATERMARK_PARAM, value=fields.Datetime.to_string(now), uid=self.env.uid, now=now))
+
+    @api.model
+    def _refresh_kpi(self, project_ids):
+        """Hitung ulang baris KPI ``project_ids`` dengan satu upsert.
+
+        Called by the cron and by the postcommit hook of project, task and
+        invoice plan changes, which are rare compared to timesheet writes.
+
+        Figures follow the project rollups: progress is the share of done root
+        tasks and actual mandays counts the closed timesheet lines.
+        """
+        self.env['project.project'].flush_model(['active', 'z_mandays_budget'])
+        self.env['project.task'].flush_model([
+            'project_id', 'parent_id', 'active', 'date_deadline', 'z_project_task_state',
+        ])
+        self.env['account.analytic.line'].flush_model(['task_id', 'z_timesheet_start_date', 'z_timesheet_end_date'])
+        self.env['project.project.invoice.plan'].flush_model(['z_project_id', 'z_amount_total'])
+        ids = list(project_ids)
+        self.env.cr.execute(SQL("""
+            DELETE FROM project_portfolio_kpi kpi
+             WHERE kpi.z_project_id = ANY(%(ids)s)
+               AND NOT EXISTS (SELECT 1 FROM project_project project
+                                WHERE project.id = kpi.z_project_id AND project.active)
+        """, ids=ids))
+        self.env.cr.execute(SQL("""
+            INSERT INTO project_portfolio_kpi (
+                z_project_id, z_task_count, z_overdue_task_count, z_progress,
+                z_mandays_budget, z_actual_mandays, z_invoice_plan_count, z_invoice_plan_total,
+                z_refreshed_at, create_uid, create_date, write_uid, write_date)
+            SELECT project.id,
+                   COALESCE(task.task_count, 0),
+                   COALESCE(task.overdue_count, 0),
+                   CASE WHEN task.root_count > 0 THEN 100.0 * task.root_done / task.root_count ELSE 0 END,
+                   COALESCE(project.z_mandays_budget, 0),
+                   COALESCE(sheet.mandays, 0),
+                   COALESCE(plan.plan_count, 0),
+                   COALESCE(plan.plan_total, 0),
+                   NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM project_project project
+         LEFT JOIN (SELECT project_id,
+                           COUNT(*) AS task_count,
+                           COUNT(*) FILTER (WHERE date_deadline < NOW() AT TIME ZONE 'UTC'
+                                              AND z_project_task_state NOT IN %(closed)s) AS overdue_count,
+                           COUNT(*) FILTER (WHERE parent_id IS NULL) AS root_count,
+                           COUNT(*) FILTER (WHERE parent_id IS NULL AND z_project_task_state = 'done') AS root_done
+                      FROM project_task
+                     WHERE active AND project_id = ANY(%(ids)s)
+                  GROUP BY project_id) task ON task.project_id = project.id
+         LEFT JOIN (SELECT task.project_id, COUNT(line.id) AS mandays
+                      FROM account_analytic_line line
+                      JOIN project_task task ON task.id = line.task_id
+                     WHERE task.active AND task.project_id = ANY(%(ids)s)
+                       AND line.z_timesheet_start_date IS NOT NULL
+                       AND line.z_timesheet_end_date IS NOT NULL
+                  GROUP BY task.project_id) sheet ON sheet.project_id = project.id
+         LEFT JOIN (SELECT z_project_id, COUNT(*) AS plan_count, SUM(z_amount_total) AS plan_total
+                      FROM project_project_invoice_plan
+                     WHERE z_project_id = ANY(%(ids)s)
+                  GROUP BY z_project_id) plan ON plan.z_project_id = project.id
+             WHERE project.active AND project.id = ANY(%(ids)s)
+            ON CONFLICT (z_project_id) DO UPDATE SET
+                z_task_count = EXCLUDED.z_task_count,
+                z_overdue_task_count = EXCLUDED.z_overdue_task_count,
+                z_progress = EXCLUDED.z_progress,
+                z_mandays_budget = EXCLUDED.z_mandays_budget,
+                z_actual_mandays = EXCLUDED.z_actual_mandays,
+                z_invoice_plan_count = EXCLUDED.z_invoice_plan_count,
+                z_invoice_plan_total = EXCLUDED.z_invoice_plan_total,
+                z_refreshed_at = EXCLUDED.z_refreshed_at,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, ids=ids, uid=self.env.uid, closed=KPI_CLOSED_TASK_STATES))
+        self.invalidate_model()
+
+    @api.model
+    def _get_dashboard_data(self):
+        """Semua baris KPI dan totalnya untuk dashboard portal, dalam satu read."""
+        rows = self.sudo().search_read([], [
+            'z_project_id', 'z_task_count', 'z_overdue_task_count', 'z_progress',
+            'z_mandays_budget', 'z_actual_mandays', 'z_invoice_plan_count', 'z_invoice_plan_total',
+        ])
+        totals = {
+            'projects': len(rows),
+            'tasks': sum(row['z_task_count'] for row in rows),
+            'overdue': sum(row['z_overdue_task_count'] for row in rows),
+            'mandays_budget': sum(row['z_mandays_budget'] for row in rows),
+            'actual_mandays': sum(row['z_actual_mandays'] for row in rows),
+            'invoice_plan_total': sum(row['z_invoice_plan_total'] for row in rows),
+        }
+        totals['progress'] = sum(row['z_progress'] for row in rows) / len(rows) if rows else 0.0
+        return rows, totals
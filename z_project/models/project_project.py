@@ -1,9 +1,27 @@
-from odoo import models, fields, api, _ 
+from collections import defaultdict
+
+from odoo import models, fields, api, tools, _ 
+
+# alur approval project: status sekarang -> status berikutnya
+PROJECT_STATUS_FLOW = {
+    'new': 'waiting',
+    'waiting': 'confirm',
+    'confirm': 'sales_dir_to_approve',
+    'sales_dir_to_approve': 'head_pmo_to_approve',
+    'head_pmo_to_approve': 'operation',
+    'operation': 'budget_approve',
+    'budget_approve': 'finance_dir_to_approve',
+    'finance_dir_to_approve': 'full_approve',
+    'full_approve': 'closed',
+}
+# multi select yang dirender form project di portal, lihat portal_m2m_fields di template
+PORTAL_FORM_MANY2MANY = ('z_project_manager_ids', 'tag_ids', 'z_project_teams_ids')
 
 
 class ProjectProject(models.Model):
 
-    _inherit = ["project.project"]
+    _inherit = ["project.project", "project.search.document.mixin"]
+    _name = "project.project"
 
     @api.depends(
         'z_task_ids.z_actual_start_date',
@@ -12,18 +30,70 @@ class ProjectProject(models.Model):
         'z_task_ids.z_project_task_state'
     )
     def _getProjectInfo(self):
+        rollups = self._get_project_rollups()
+        for this in self:
+            rollup = rollups.get(this._origin.id, {})
+            this.z_task_ids = [(6, 0, rollup.get('task_ids', []))]
+            this.z_actual_start_date = rollup.get('actual_start_date', False)
+            this.z_actual_end_date = rollup.get('actual_end_date', False)
+            this.z_actual_budget_mandays = rollup.get('actual_mandays', 0)
+            this.z_progress_project = rollup.get('progress', 0.0)
+
+    def _get_project_rollups(self):
+        """Rollup task and timesheet figures for the whole recordset at once.
+
+        Returns a dict keyed by project id. The number of queries does not
+        depend on the size of the recordset.
+        """
+        project_ids = tuple(id_ for id_ in self._origin.ids if id_)
+        if not project_ids:
+            return {}
+        self.env['project.task'].flush_model([
+            'project_id', 'parent_id', 'active', 'z_actual_start_date', 'z_actual_end_date', 'z_project_task_state',
+        ])
+        self.env['account.analytic.line'].flush_model(['task_id', 'z_timesheet_start_date', 'z_timesheet_end_date'])
+        # the latest end date stays empty while one task has not ended yet,
+        # like ``order='z_actual_end_date desc'`` which sorts NULL first
+        self.env.cr.execute("""
+            SELECT project_id,
+                   ARRAY_AGG(id ORDER BY id),
+                   MIN(z_actual_start_date),
+                   CASE WHEN BOOL_AND(z_actual_end_date IS NOT NULL) THEN MAX(z_actual_end_date) END,
+                   COUNT(*) FILTER (WHERE parent_id IS NULL),
+                   COUNT(*) FILTER (WHERE parent_id IS NULL AND z_project_task_state = 'done')
+              FROM project_task
+             WHERE project_id IN %s AND active
+          GROUP BY project_id
+        """, [project_ids])
+        rollups = {}
+        for project_id, task_ids, start_date, end_date, root_count, root_done in self.env.cr.fetchall():
+            rollups[project_id] = {
+                'task_ids': task_ids,
+                'actual_start_date': start_date or False,
+                'actual_end_date': end_date or False,
+                'actual_mandays': 0,
+                'progress': (100.0 * root_done / root_count) if root_count else 0.0,
+            }
+        self.env.cr.execute("""
+            SELECT task.project_id, COUNT(line.id)
+              FROM account_analytic_line line
+              JOIN project_task task ON task.id = line.task_id
+             WHERE task.project_id IN %s AND task.active
+               AND line.z_timesheet_start_date IS NOT NULL
+               AND line.z_timesheet_end_date IS NOT NULL
+          GROUP BY task.project_id
+        """, [project_ids])
+        for project_id, actual_mandays in self.env.cr.fetchall():
+            rollups[project_id]['actual_mandays'] = actual_mandays
+        return rollups
+
+    @api.depends('name', 'label_tasks', 'partner_id.name', 'user_id.name')
+    def _compute_search_document(self):
+        """Teks gabungan untuk pencarian portal, di-index trigram."""
         for this in self:
-            parent_task = self.env['project.task'].sudo().search([('project_id', '=', this.id),('parent_id', '=', False)], order='id asc')
-            all_task = self.env['project.task'].sudo().search([('project_id', '=', this.id)], order='id asc')
-            actual_start = self.env['project.task'].sudo().search([('project_id', '=', this.id)], order='z_actual_start_date asc', limit=1)
-            actual_end = self.env['project.task'].sudo().search([('project_id', '=', this.id)], order='z_actual_end_date desc', limit=1)
-            actual_mandays = len(all_task.mapped('timesheet_ids').filtered(lambda x: x.z_timesheet_start_date and x.z_timesheet_end_date))
-            this.z_task_ids = [(6, 0, all_task.ids)]
-            this.z_actual_start_date = actual_start.z_actual_start_date if actual_start else False
-            this.z_actual_end_date = actual_end.z_actual_end_date if actual_end else False
-            this.z_actual_budget_mandays = actual_mandays
-            progress = (100.0 * len(parent_task.filtered(lambda x: x.z_project_task_state == 'done'))/ len(parent_task)) if parent_task else 0.0
-            this.z_progress_project = progress
+            this.z_search_document = ' '.join(filter(None, [
+                this.name, this.label_tasks, this.partner_id.name, this.user_id.name,
+            ]))
 
     @api.onchange('z_group_type_project')
     def onchange_group(self):
@@ -73,26 +143,87 @@ class ProjectProject(models.Model):
     z_project_teams_ids = fields.Many2many('hr.employee',relation='project_project_project_teams_ids_rel',string='Project Teams')
     z_program_name_ids = fields.One2many('project.project.program.name','z_project_id',string='Program Name')
     z_invoice_plan_ids = fields.One2many('project.project.invoice.plan','z_project_id',string='Invoice Plan')
+    z_search_document = fields.Text(string='Search Document',compute=_compute_search_document,store=True,index='trigram')
 
     def action_confirm(self):
-        if self.z_project_status == 'new':
-            self.z_project_status = 'waiting'
-        elif self.z_project_status == 'waiting':
-            self.z_project_status = 'confirm'
-        elif self.z_project_status == 'confirm':
-            self.z_project_status = 'sales_dir_to_approve'
-        elif self.z_project_status == 'sales_dir_to_approve':
-            self.z_project_status = 'head_pmo_to_approve'
-        elif self.z_project_status == 'head_pmo_to_approve':
-            self.z_project_status = 'operation'
-        elif self.z_project_status == 'operation':
-            self.z_project_status = 'budget_approve'
-        elif self.z_project_status == 'budget_approve':
-            self.z_project_status = 'finance_dir_to_approve'
-        elif self.z_project_status == 'finance_dir_to_approve':
-            self.z_project_status = 'full_approve'
-        elif self.z_project_status == 'full_approve':
-            self.z_project_status = 'closed'
+        self._advance_project_status()
+
+    def _advance_project_status(self):
+        """Naikkan status semua project satu langkah di alur approval.
+
+        Projects are grouped by their next status so every target status is
+        written once, and the transitions are logged in a single batch of
+        chatter messages. Returns ``{target status: projects}``.
+        """
+        by_target = defaultdict(lambda: self.browse())
+        for project in self:
+            target = PROJECT_STATUS_FLOW.get(project.z_project_status)
+            if target:
+                by_target[target] |= project
+        labels = dict(self._fields['z_project_status']._description_selection(self.env))
+        bodies = {}
+        for target, projects in by_target.items():
+            for project in projects:
+                bodies[project.id] = _("Project status: %(old)s → %(new)s",
+                                       old=labels.get(project.z_project_status), new=labels.get(target))
+        for target, projects in by_target.items():
+            projects.with_context(tracking_disable=True).write({'z_project_status': target})
+        if bodies:
+            self.browse(list(bodies))._message_log_batch(bodies)
+        return dict(by_target)
+
+    @tools.ormcache()
+    def _get_portal_form_metadata(self):
+        """(many2many yang tampil di form portal, semua field yang bisa ditulis), di-cache per registry."""
+        writable = frozenset(
+            name for name, field in self._fields.items()
+            if field.store and not (field.compute and not field.inverse and field.readonly)
+        )
+        many2many = tuple(
+            name for name in PORTAL_FORM_MANY2MANY
+            if name in writable and self._fields[name].type == 'many2many'
+        )
+        return many2many, writable
+
+    def _get_portal_changed_vals(self, vals):
+        """Only the values of ``vals`` that differ from the record.
+
+        Values are normalized the way the ORM caches them, so ``'5'`` and a
+        partner with id 5, or ``[(6, 0, ids)]`` and the same set of ids, are
+        equal and are not written again.
+        """
+        self.ensure_one()
+        writable = self._get_portal_form_metadata()[1]
+        changed = {}
+        for name, value in vals.items():
+            field = self._fields.get(name)
+            if not field or name not in writable:
+                changed[name] = value
+                continue
+            old = field.convert_to_cache(self[name], self, validate=False)
+            try:
+                new = field.convert_to_cache(value, self, validate=False)
+            except (ValueError, TypeError):
+                changed[name] = value
+                continue
+            if field.type in ('many2many', 'one2many'):
+                if set(old or ()) != set(new or ()):
+                    changed[name] = value
+            elif (old or False) != (new or False):
+                changed[name] = value
+        return changed
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        projects = super().create(vals_list)
+        self.env['project.portfolio.kpi']._mark_projects_dirty(projects)
+        return projects
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'active', 'z_mandays_budget'} & set(vals):
+            self.env['project.portfolio.kpi']._mark_projects_dirty(self)
+        return res
 
     def action_failed(self):
         self.z_project_status = 'failed'
@@ -119,7 +250,7 @@ class ProjectProjectProgramName(models.Model):
 
     _name = "project.project.program.name"
     _description = "Program Name"
-    _inherit = ["mail.thread","mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin","mail.thread","mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id asc"
 
@@ -131,7 +262,7 @@ class ProjectProjectInvoicePlan(models.Model):
 
     _name = "project.project.invoice.plan"
     _description = "Invoice Plan"
-    _inherit = ["mail.thread","mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin","mail.thread","mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id asc"
 
@@ -141,3 +272,20 @@ class ProjectProjectInvoicePlan(models.Model):
     z_date = fields.Date(string='Invoice Date')
     z_amount_total = fields.Float(string='Amount Total')
     z_state = fields.Char(string='Status')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        plans = super().create(vals_list)
+        self.env['project.portfolio.kpi']._mark_projects_dirty(plans.z_project_id)
+        return plans
+
+    def write(self, vals):
+        old_projects = self.z_project_id
+        res = super().write(vals)
+        if {'z_project_id', 'z_amount_total'} & set(vals):
+            self.env['project.portfolio.kpi']._mark_projects_dirty(old_projects | self.z_project_id)
+        return res
+
+    def unlink(self):
+        self.env['project.portfolio.kpi']._mark_projects_dirty(self.z_project_id)
+        return super().unlink()
@@ -0,0 +1,6 @@
+from odoo import models
+
+
+class ProjectTags(models.Model):
+    _name = "project.tags"
+    _inherit = ["project.tags", "project.portal.master.data.mixin"]
@@ -1,28 +1,72 @@
 from odoo import api, fields, models, _
 from datetime import datetime, date, timedelta, timezone
 from odoo.exceptions import ValidationError
+from odoo.osv import expression
 from odoo.tools.translate import _
+from odoo.tools import float_round
 from html import unescape
+import functools
+import logging
+import psycopg2
 import time
 import re
+from markupsafe import Markup
+
+_logger = logging.getLogger(__name__)
+
+# antrian chatter subtask per parent, dikirim sekali setelah commit
+SUBTASK_CHATTER_KEY = 'z_project.subtask_chatter'
 
 
 class ProjectTask(models.Model):
-    _inherit = "project.task"
+    _inherit = ["project.task", "project.search.document.mixin"]
+    _name = "project.task"
+    _parent_store = True
 
     def _reindex_subtasks(self):
         for idx, child in enumerate(self.child_ids.sorted("create_date"), start=1):
             child.name = f"{self.name}.{str(idx).zfill(2)}"
             child._reindex_subtasks()
+        # numbering restarted from 1, the counter is seeded again from the new names
+        self.env['project.task.code.counter']._reset([(self.project_id.id, self.id)])
 
     def get_all_subtasks_inclusive(self):
         """Helper untuk ambil task + semua subtasks (recursive)."""
-        self.ensure_one()
-        all_tasks = self
-        if self.child_ids:
-            for child in self.child_ids:
-                all_tasks |= child.get_all_subtasks_inclusive()
-        return all_tasks
+        return self | self.search([('id', 'child_of', self.ids)])
+
+    def _get_subtree_timesheet_rollups(self):
+        """Aggregate the timesheets of each task and all of its descendants.
+
+        Descendants are resolved through ``parent_path`` so the whole
+        recordset is answered by a single grouped query.
+        """
+        task_ids = tuple(id_ for id_ in self._origin.ids if id_)
+        if not task_ids:
+            return {}
+        self.flush_model(['parent_id', 'parent_path', 'active'])
+        self.env['account.analytic.line'].flush_model(['task_id', 'z_timesheet_start_date', 'z_timesheet_end_date'])
+        self.env.cr.execute("""
+            SELECT task.id,
+                   MIN(line.z_timesheet_start_date),
+                   MAX(line.z_timesheet_end_date),
+                   COUNT(line.id) FILTER (
+                       WHERE line.z_timesheet_start_date IS NOT NULL AND line.z_timesheet_end_date IS NOT NULL
+                   )
+              FROM project_task task
+              JOIN project_task node ON node.parent_path LIKE task.parent_path || '%%'
+                                    AND (node.active OR node.id = task.id)
+              JOIN account_analytic_line line ON line.task_id = node.id
+             WHERE task.id IN %s
+          GROUP BY task.id
+        """, [task_ids])
+        return {
+            task_id: {
+                'actual_start_date': start_date or False,
+                'actual_end_date': end_date or False,
+                'actual_mandays': actual_mandays,
+            }
+            for task_id, start_date, end_date, actual_mandays in self.env.cr.fetchall()
+        }
 
     @api.depends(
         'timesheet_ids.z_timesheet_start_date',
@@ -31,18 +75,17 @@ class ProjectTask(models.Model):
         'child_ids.z_actual_end_date'
     )
     def _compute_actual_dates(self):
+        rollups = self._get_subtree_timesheet_rollups()
         for task in self:
-            all_tasks = task.get_all_subtasks_inclusive()
-            all_lines = all_tasks.mapped("timesheet_ids")
-            start_dates = [d for d in all_lines.mapped("z_timesheet_start_date") if d]
-            end_dates = [d for d in all_lines.mapped("z_timesheet_end_date") if d]
-            task.z_actual_start_date = min(start_dates) if start_dates else False
-            task.z_actual_end_date = max(end_dates) if end_dates else False
-
-    @api.depends('z_project_task_state', 'child_ids.z_progress_project')
+            rollup = rollups.get(task._origin.id, {})
+            task.z_actual_start_date = rollup.get('actual_start_date', False)
+            task.z_actual_end_date = rollup.get('actual_end_date', False)
+
+    @api.depends('z_project_task_state', 'child_ids')
     def _compute_progress(self):
         """
         Hitung progress berdasarkan status done atau progress anak-anaknya.
+        Perubahan progress anak ke atas di-handle oleh _propagate_progress.
         """
         for task in self:
             if task.child_ids:
@@ -58,6 +101,57 @@ class ProjectTask(models.Model):
                 else:
                     task.z_progress_project = 0
 
+    def _propagate_progress(self):
+        """Recompute the progress of the ancestors of ``self``, deepest first.
+
+        Every ancestor is refreshed from a per-parent sum and count of its
+        children that is read once and then adjusted with the deltas of the
+        levels below, instead of re-reading all children at every level.
+        """
+        ancestor_ids = set()
+        for task in self.exists():
+            ancestor_ids.update(int(x) for x in (task.parent_path or '').split('/')[:-2])
+        if not ancestor_ids:
+            return
+        self.flush_model(['parent_id', 'parent_path', 'active', 'z_project_task_state', 'z_progress_project'])
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, parent_id, parent_path, z_project_task_state, z_progress_project
+              FROM project_task
+             WHERE id IN %s
+        """, [tuple(ancestor_ids)])
+        ancestors = cr.fetchall()
+        cr.execute("""
+            SELECT parent_id, SUM(z_progress_project), COUNT(*)
+              FROM project_task
+             WHERE parent_id IN %s AND active
+          GROUP BY parent_id
+        """, [tuple(ancestor_ids)])
+        child_sums = {parent_id: [float(total or 0.0), count] for parent_id, total, count in cr.fetchall()}
+        updates = {}
+        for task_id, parent_id, parent_path, state, progress in sorted(ancestors, key=lambda x: -(x[2] or '').count('/')):
+            total, count = child_sums.get(task_id, (0.0, 0))
+            if count:
+                new_progress = float_round(total / count, precision_digits=2)
+            else:
+                new_progress = 100.0 if state == 'done' else 0.0
+            old_progress = float(progress or 0.0)
+            if new_progress == old_progress:
+                continue
+            updates[task_id] = new_progress
+            if parent_id in child_sums:
+                child_sums[parent_id][0] += new_progress - old_progress
+        if not updates:
+            return
+        cr.execute("""
+            UPDATE project_task task
+               SET z_progress_project = data.progress,
+                   write_date = (now() at time zone 'UTC')
+              FROM (SELECT UNNEST(%s::int[]) AS id, UNNEST(%s::numeric[]) AS progress) data
+             WHERE task.id = data.id
+        """, [list(updates), list(updates.values())])
+        self.browse(list(updates)).invalidate_recordset(['z_progress_project', 'write_date'])
+
     @api.depends(
         'project_id.z_mandays_budget',
         'project_id.task_ids',
@@ -65,27 +159,57 @@ class ProjectTask(models.Model):
         'parent_id.child_ids',
     )
     def _getMandaysBudget(self):
+        root_counts, child_counts = self._get_distribution_counts()
         for this in self:
             mandays = this.project_id.z_mandays_budget or 0
             clean_mandays = mandays
-            if clean_mandays and this.parent_id.child_ids:
+            if clean_mandays and child_counts.get(this.parent_id._origin.id):
                 mandays = this.parent_id.z_mandays_budget or 0
-                clean_mandays = mandays / len(this.parent_id.child_ids)
-            elif clean_mandays and this.project_id.task_ids:
-                clean_mandays = mandays / len(this.project_id.task_ids.filtered(lambda x: not x.parent_id))
+                clean_mandays = mandays / child_counts[this.parent_id._origin.id]
+            elif clean_mandays and root_counts.get(this.project_id._origin.id):
+                clean_mandays = mandays / root_counts[this.project_id._origin.id]
             this.z_mandays_budget = clean_mandays
 
+    def _get_distribution_counts(self):
+        """Jumlah root task per project dan jumlah subtask per parent.
+
+        Two grouped queries for the whole recordset, the task lists of the
+        projects and parents are never loaded. Task and project domains follow
+        ``project_id.task_ids`` / ``parent_id.child_ids``.
+        """
+        Task = self.env['project.task']
+        project_ids = [id_ for id_ in self.project_id._origin.ids if id_]
+        parent_ids = [id_ for id_ in self.parent_id._origin.ids if id_]
+        root_counts = {}
+        child_counts = {}
+        if project_ids:
+            Project = self.env['project.project']
+            domain = Project._fields['task_ids'].get_domain_list(Project)
+            root_counts = {
+                project.id: count
+                for project, count in Task._read_group(
+                    expression.AND([domain, [('project_id', 'in', project_ids), ('parent_id', '=', False)]]),
+                    ['project_id'], ['__count'])
+            }
+        if parent_ids:
+            domain = Task._fields['child_ids'].get_domain_list(Task)
+            child_counts = {
+                parent.id: count
+                for parent, count in Task._read_group(
+                    expression.AND([domain, [('parent_id', 'in', parent_ids)]]),
+                    ['parent_id'], ['__count'])
+            }
+        return root_counts, child_counts
+
     @api.depends(
         'timesheet_ids.unit_amount',
         'child_ids.timesheet_ids.unit_amount'
     )
     def _getActualMandaysBudget(self):
+        # self task and all subtask
+        rollups = self._get_subtree_timesheet_rollups()
         for this in self:
-            # self task and all subtask
-            all_tasks = this.get_all_subtasks_inclusive()
-            actual_mandays = len(all_tasks.mapped('timesheet_ids').filtered(
-                lambda x: x.z_timesheet_start_date and x.z_timesheet_end_date))
-            this.z_actual_budget_mandays = actual_mandays
+            this.z_actual_budget_mandays = rollups.get(this._origin.id, {}).get('actual_mandays', 0)
 
     @api.depends('child_ids')
     def _getSubtaskCount(self):
@@ -107,14 +231,15 @@ class ProjectTask(models.Model):
         'parent_id.child_ids',
     )
     def _getBobot(self):
+        root_counts, child_counts = self._get_distribution_counts()
         for this in self:
             bobot = 100
             clean_bobot = bobot
-            if this.parent_id.child_ids:
+            if child_counts.get(this.parent_id._origin.id):
                 bobot = this.parent_id.z_bobot
-                clean_bobot = bobot / len(this.parent_id.child_ids)
-            elif this.project_id.task_ids:
-                clean_bobot = bobot / len(this.project_id.task_ids.filtered(lambda x: not x.parent_id))
+                clean_bobot = bobot / child_counts[this.parent_id._origin.id]
+            elif root_counts.get(this.project_id._origin.id):
+                clean_bobot = bobot / root_counts[this.project_id._origin.id]
             this.z_bobot = clean_bobot
 
     def _compute_running_duration(self):
@@ -131,15 +256,18 @@ class ProjectTask(models.Model):
                 this.z_running_duration = f"{total_hours:02}:{minutes:02}:{seconds:02}"
 
     def _getTimeStart(self):
+        running_lines = {}
+        employee = self.env['hr.employee']._get_employee_by_user()
+        if employee:
+            for line in self.env['account.analytic.line']._get_running_timers(employee.id, self._origin.ids):
+                running_lines.setdefault(line.task_id.id, line)
         for this in self:
-            time_start = False
-            employee_ids = self.env['hr.employee'].sudo().search([('user_id', '=', self.env.user.id)], limit=1)
-            if employee_ids:
-                timesheet_ids = this.timesheet_ids.filtered(
-                    lambda x: x.employee_id.id == employee_ids.id and not x.z_timesheet_end_date)
-                if timesheet_ids:
-                    time_start = timesheet_ids.z_timesheet_start_date
-            this.z_time_start = time_start
+            line = running_lines.get(this._origin.id)
+            # initial state of the RealtimeDatetime widget, bus notifications take over afterwards
+            this.z_time_start = line.z_timesheet_start_date if line else False
+            this.z_timer_segment_start = line.z_segment_start_date if line else False
+            this.z_timer_active_duration = line.z_active_duration if line else 0.0
+            this.z_timer_paused = line.z_is_paused if line else False
 
     @api.depends('project_id.label_tasks')
     def _compute_name_of_project(self):
@@ -147,6 +275,14 @@ class ProjectTask(models.Model):
         for task in self:
             task.z_name_of_project = task.project_id.label_tasks if task.project_id else ''
 
+    @api.depends('name', 'project_id.name', 'partner_id.name', 'z_master_task_id.z_name')
+    def _compute_search_document(self):
+        """Teks gabungan untuk pencarian portal, di-index trigram."""
+        for task in self:
+            task.z_search_document = ' '.join(filter(None, [
+                task.name, task.project_id.name, task.partner_id.name, task.z_master_task_id.z_name,
+            ]))
+
     @api.depends('project_id.z_type_in_project')
     def _compute_project_type_visibility(self):
         """Determine if maintenance fields should be visible"""
@@ -155,6 +291,7 @@ class ProjectTask(models.Model):
 
     # override
     name = fields.Char("Title", required=False)
+    parent_path = fields.Char(index=True)
     project_id = fields.Many2one('project.project', string='Projects',
                                  domain="['|', ('company_id', '=', False), ('company_id', '=?',  company_id)]",
                                  compute="_compute_project_id", store=True, precompute=True, recursive=True,
@@ -199,6 +336,9 @@ class ProjectTask(models.Model):
     z_timesheet_count = fields.Integer(string='Count', compute=_getTimesheetCount, store=False)
     z_timesheet_done_count = fields.Integer(string='Done Percent', compute=_getTimesheetCount, store=False)
     z_time_start = fields.Datetime(string="Time Start", compute=_getTimeStart, store=False)
+    z_timer_segment_start = fields.Datetime(string="Timer Running Since", compute=_getTimeStart, store=False)
+    z_timer_active_duration = fields.Float(string="Timer Active Duration", compute=_getTimeStart, store=False)
+    z_timer_paused = fields.Boolean(string="Timer Paused", compute=_getTimeStart, store=False)
     z_running_duration = fields.Char(string="Running Duration", compute=_compute_running_duration, store=False)
     z_name_of_project = fields.Char(string='Name of Project', compute='_compute_name_of_project', store=True,
                                     readonly=True)
@@ -206,43 +346,117 @@ class ProjectTask(models.Model):
                                       store=True)
     z_timer_attachment_ids = fields.Many2many('ir.attachment', 'task_timer_attachment_rel', 'task_id', 'attachment_id',
                                               string='Timer Attachments')
+    z_search_document = fields.Text(string='Search Document', compute='_compute_search_document', store=True,
+                                    index='trigram')
 
     # not used
     z_quality_calculation = fields.Float(string="Quality Calc (%)")
     z_time_end = fields.Datetime(string='Time End')
 
-    @api.model
-    def create(self, vals):
-        task = super().create(vals)
-        if task.parent_id:
-            task.generate_sequence_name()
-            task.parent_id.message_post(
-                body=_("Subtask %s dibuat di bawah %s.") % (
-                    task.display_name, task.parent_id.display_name
-                )
-            )
-        else:
-            task.generate_project_sequence_name()
-        task._getMandaysBudget()
-        task._getActualMandaysBudget()
-        task._getBobot()
-        return task
+    @api.model_create_multi
+    def create(self, vals_list):
+        # batch jobs set z_skip_master_tracking, tasks are then created without chatter / tracking
+        tracking_context = self.env['project.master.tracking.mixin']._get_master_tracking_context()
+        tasks = super(ProjectTask, self.with_context(**tracking_context)).create(vals_list).with_env(self.env)
+        tasks._generate_sequence_names()
+        tasks._queue_subtask_chatter('created')
+        # sibling distribution is recomputed once for the whole batch, bulk
+        # imports defer it to the end of the file (see project.task.import)
+        if not self.env.context.get('z_defer_rollup'):
+            tasks._getMandaysBudget()
+            tasks._getActualMandaysBudget()
+            tasks._getBobot()
+            tasks._propagate_progress()
+        self.env['project.portfolio.kpi']._mark_projects_dirty(tasks.project_id)
+        return tasks
+
+    def write(self, vals):
+        old_parents = self.env['project.task']
+        if 'parent_id' in vals or 'active' in vals:
+            old_parents = self.mapped('parent_id')
+        kpi_fields = {'project_id', 'parent_id', 'active', 'date_deadline', 'z_project_task_state'} & set(vals)
+        kpi_tasks = self
+        if kpi_fields == {'z_project_task_state'}:
+            # the timer rewrites the state on every start, only real changes count
+            kpi_tasks = self.filtered(lambda x: x.z_project_task_state != vals['z_project_task_state'])
+        old_projects = kpi_tasks.project_id if kpi_fields else self.env['project.project']
+        counter_keys = set()
+        if 'parent_id' in vals or 'project_id' in vals:
+            counter_keys = {(task.project_id.id, task.parent_id.id) for task in self}
+        res = super().write(vals)
+        if counter_keys:
+            # moved tasks leave / join a numbering sequence, reseed both sides
+            counter_keys |= {(task.project_id.id, task.parent_id.id) for task in self}
+            self.env['project.task.code.counter']._reset(counter_keys)
+        if {'z_project_task_state', 'parent_id', 'active'} & set(vals):
+            (self | old_parents)._propagate_progress()
+        if kpi_fields and kpi_tasks:
+            self.env['project.portfolio.kpi']._mark_projects_dirty(old_projects | kpi_tasks.project_id)
+        return res
 
     def unlink(self):
+        self.env['project.task.code.counter']._release(self)
         parents = self.mapped("parent_id")
-        deleted_names = self.mapped("display_name")
+        # names are read before the records are gone, grouped per parent
+        self._queue_subtask_chatter('deleted')
+        children = self.with_context(active_test=False).child_ids - self
+        self.env['project.portfolio.kpi']._mark_projects_dirty(self.project_id)
         res = super().unlink()
-        for parent in parents:
-            parent.message_post(
-                body=_("Subtask %s dihapus dari parent %s.") % (
-                    ", ".join(deleted_names), parent.display_name
-                )
-            )
+        # subtasks left without parent become roots, rebase their parent_path
+        for orphan in children.exists().filtered(lambda x: not x.parent_id):
+            orphan._parent_store_update()
+        parents.exists()._propagate_progress()
         return res
 
+    def _queue_subtask_chatter(self, event):
+        """Tunda pesan chatter subtask dibuat/dihapus sampai transaksi di-commit.
+
+        Events are grouped per parent and posted as one summary message by a
+        postcommit hook, in its own cursor, so the savepoint flushes of batch
+        jobs do not split them. Events of a rolled-back savepoint stay queued,
+        the hook re-checks which subtasks really exist (created) or are really
+        gone (deleted).
+        """
+        queue = self.env.cr.postcommit.data.get(SUBTASK_CHATTER_KEY)
+        if queue is None:
+            queue = self.env.cr.postcommit.data[SUBTASK_CHATTER_KEY] = {}
+            self.env.cr.postcommit.add(functools.partial(self._flush_subtask_chatter, queue))
+        for task in self.filtered('parent_id'):
+            events = queue.setdefault(task.parent_id.id, {'created': {}, 'deleted': {}})
+            events[event][task.id] = task.display_name
+
+    @api.model
+    def _flush_subtask_chatter(self, queue):
+        if not queue:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                self.with_env(self.env(cr=cr))._post_subtask_chatter(queue)
+        except Exception:
+            _logger.exception("Posting subtask chatter failed")
+
+    @api.model
+    def _post_subtask_chatter(self, queue):
+        task_ids = {task_id for events in queue.values() for names in events.values() for task_id in names}
+        existing = set(self.with_context(active_test=False).browse(task_ids).exists().ids)
+        for parent in self.browse(list(queue)).exists():
+            events = queue[parent.id]
+            created = [name for task_id, name in events['created'].items() if task_id in existing]
+            deleted = [name for task_id, name in events['deleted'].items() if task_id not in existing]
+            lines = []
+            if created:
+                lines.append(_("Subtask %s dibuat di bawah %s.") % (
+                    ", ".join(created), parent.display_name
+                ))
+            if deleted:
+                lines.append(_("Subtask %s dihapus dari parent %s.") % (
+                    ", ".join(deleted), parent.display_name
+                ))
+            if lines:
+                parent.message_post(body=Markup("<br/>").join(lines))
+
     def action_request_timesheet(self):
-        employee_ids = self.env['hr.employee'].sudo().search([('user_id', '=', self.env.user.id)], order='id desc',
-                                                             limit=1)
+        employee_ids = self.env['hr.employee']._get_employee_by_user()
         values = {
             'default_partner_id': self.partner_id.id,
             'default_project_id': self.project_id.id,
@@ -311,7 +525,7 @@ class ProjectTask(models.Model):
         self.z_project_task_state = 'new'
 
     def action_start_timesheet(self):
-        employee = self.env['hr.employee'].sudo().search([('user_id', '=', self.env.user.id)], limit=1)
+        employee = self.env['hr.employee']._get_employee_by_user()
         if not employee:
             raise ValidationError('Kamu tidak masuk dalam data karyawan. Silahkan hubungi administrator.')
 
@@ -319,25 +533,24 @@ class ProjectTask(models.Model):
         if self.z_project_task_state == 'new':
             self.z_project_task_state = 'in_progress'
 
-        timesheet = self.env['account.analytic.line'].sudo().search([
-            ('id', 'in', self.timesheet_ids.ids),
-            ('task_id', '=', self.id),
-            ('employee_id', '=', employee.id),
-            ('z_timesheet_end_date', '=', False)
-        ], limit=1)
+        timesheet = self.env['account.analytic.line']._get_running_timers(employee.id, self.id)
         if timesheet:
             raise ValidationError('Terdapat timesheet yang belum selesai.')
 
         self.action_timer_start()
-        self.timesheet_ids = [(0, 0, {
-            'date': datetime.now(),
-            'z_timesheet_start_date': datetime.now(),
-            'employee_id': employee.id,
-            'z_is_paused': False,
-        })]
+        try:
+            with self.env.cr.savepoint():
+                self.timesheet_ids = [(0, 0, {
+                    'date': datetime.now(),
+                    'z_timesheet_start_date': datetime.now(),
+                    'employee_id': employee.id,
+                    'z_is_paused': False,
+                })]
+        except psycopg2.errors.UniqueViolation:
+            raise ValidationError('Terdapat timesheet yang belum selesai.')
 
     def action_end_timesheet(self):
-        employee_ids = self.env['hr.employee'].sudo().search([('user_id', '=', self.env.user.id)], limit=1)
+        employee_ids = self.env['hr.employee']._get_employee_by_user()
         if not employee_ids:
             raise ValidationError('Kamu tidak masuk dalam data karyawan. Silahkan hubungi administrator.')
         timesheet_ids = self.env['account.analytic.line'].sudo().search(
@@ -361,12 +574,8 @@ class ProjectTask(models.Model):
                         [self.env.ref('z_project.z_project_task_form_timer').id, 'form'],
                     ],
                 }
-            timesheet_ids.write({
-                'z_timesheet_end_date': datetime.now(),
-                'name': self.z_description,
-                'z_state': 'approved',
-                'z_is_paused': False,  # NEW: Reset pause state when ending
-            })
+            timesheet_ids.action_stop_timer(self.z_description)
+            timesheet_ids.z_state = 'approved'
 
     def action_finish_task(self):
         # validasi sub-task
@@ -378,43 +587,37 @@ class ProjectTask(models.Model):
     def generate_sequence_name(self):
         """Generate nama otomatis untuk subtask + deteksi gap"""
         if self.parent_id:
-            siblings = self.parent_id.child_ids.filtered(lambda t: t.id != self.id)
-            existing_numbers = []
-            for sib in siblings:
-                if sib.name and sib.name.startswith(self.parent_id.name + "."):
-                    try:
-                        num = int(sib.name.split(".")[-1])
-                        existing_numbers.append(num)
-                    except:
-                        pass
-            if existing_numbers:
-                next_number = max(existing_numbers) + 1
-                missing = set(range(1, next_number)) - set(existing_numbers)
-                self.name = f"{self.parent_id.name}.{str(next_number).zfill(2)}"
-                return min(missing) if missing else False
-            else:
-                self.name = f"{self.parent_id.name}.01"
-                return False
+            return self._generate_sequence_names().get(self.id, False)
 
     def generate_project_sequence_name(self):
         if self.project_id:
-            siblings = self.project_id.task_ids.filtered(lambda t: not t.parent_id and t.id != self.id)
-            existing_numbers = []
-            for sib in siblings:
-                if sib.name and sib.name.startswith("T-"):
-                    try:
-                        num = int(sib.name.split("-")[-1])
-                        existing_numbers.append(num)
-                    except:
-                        pass
-            if existing_numbers:
-                next_number = max(existing_numbers) + 1
-                missing = set(range(1, next_number)) - set(existing_numbers)
-                self.name = f"T-{str(next_number).zfill(2)}"
-                return min(missing) if missing else False
-            else:
-                self.name = "T-01"
-                return False
+            return self._generate_sequence_names().get(self.id, False)
+
+    def _generate_sequence_names(self):
+        """Kasih kode T-xx / T-xx.yy ke semua task sekaligus.
+
+        Nomor diambil satu blok per project / parent, urut sesuai recordset,
+        jadi hasilnya sama dengan membuat task satu per satu.
+        """
+        Counter = self.env['project.task.code.counter']
+        groups = {}
+        for task in self:
+            if task.parent_id:
+                groups.setdefault((task.project_id.id, task.parent_id.id), []).append(task)
+            elif task.project_id:
+                groups.setdefault((task.project_id.id, False), []).append(task)
+        missing_by_task = {}
+        for (project_id, parent_id), tasks in groups.items():
+            number, missing = Counter._allocate(project_id, parent_id, count=len(tasks), exclude_ids=self.ids)
+            prefix = f"{tasks[0].parent_id.name}." if parent_id else "T-"
+            for task in tasks:
+                task.write({
+                    'name': f"{prefix}{str(number).zfill(2)}",
+                    'z_missing_from': f"{prefix}{str(missing).zfill(2)}" if missing else False,
+                })
+                missing_by_task[task.id] = missing
+                number += 1
+        return missing_by_task
 
     def action_view_subtask(self):
         self.ensure_one()
@@ -428,17 +631,184 @@ class ProjectTask(models.Model):
         return action
 
 
+class ProjectTaskCodeCounter(models.Model):
+    _name = "project.task.code.counter"
+    _description = "Task Code Counter"
+    _rec_name = "z_project_id"
+    _order = "id asc"
+
+    z_project_id = fields.Many2one('project.project', string='Project', ondelete='cascade', index=True)
+    z_parent_id = fields.Many2one('project.task', string='Parent Task', ondelete='cascade', index=True)
+    z_last_number = fields.Integer(string='Last Number')
+    z_gap_numbers = fields.Char(string='Missing Numbers', help="Nomor yang kosong di bawah nomor terakhir, dipisah koma.")
+
+    def init(self):
+        # one counter per project for root tasks (T-xx) and one per parent for subtasks (T-xx.yy)
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS project_task_code_counter_project_uniq
+                ON project_task_code_counter (z_project_id) WHERE z_parent_id IS NULL
+        """)
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS project_task_code_counter_parent_uniq
+                ON project_task_code_counter (z_parent_id) WHERE z_parent_id IS NOT NULL
+        """)
+
+    def _key_clause(self, project_id, parent_id):
+        if parent_id:
+            return "z_parent_id = %s", [parent_id]
+        return "z_project_id = %s AND z_parent_id IS NULL", [project_id]
+
+    def _parse_number(self, name, parent_name=None):
+        """Nomor urut dari nama task (T-07 -> 7, T-07.03 -> 3), None kalau formatnya lain."""
+        try:
+            if parent_name is not None:
+                if name and name.startswith(parent_name + "."):
+                    return int(name.split(".")[-1])
+            elif name and name.startswith("T-"):
+                return int(name.split("-")[-1])
+        except ValueError:
+            pass
+        return None
+
+    def _format_gaps(self, numbers):
+        return ",".join(str(n) for n in sorted(numbers))
+
+    def _parse_gaps(self, value):
+        return {int(n) for n in (value or '').split(",") if n}
+
+    def _seed(self, project_id, parent_id, exclude_ids=()):
+        """(nomor terakhir, gap) dari nama sibling yang sudah ada, untuk counter baru."""
+        cr = self.env.cr
+        parent_name = None
+        if parent_id:
+            parent_name = self.env['project.task'].browse(parent_id).name or ''
+            cr.execute("SELECT id, name FROM project_task WHERE parent_id = %s AND active", [parent_id])
+        else:
+            cr.execute("SELECT id, name FROM project_task WHERE project_id = %s AND parent_id IS NULL AND active",
+                       [project_id])
+        existing = set()
+        for task_id, name in cr.fetchall():
+            if task_id in exclude_ids:
+                continue
+            number = self._parse_number(name, parent_name)
+            if number is not None:
+                existing.add(number)
+        last_number = max(existing) if existing else 0
+        return last_number, set(range(1, last_number)) - existing
+
+    @api.model
+    def _allocate(self, project_id, parent_id, count=1, exclude_ids=()):
+        """Ambil ``count`` nomor berikutnya secara atomik.
+
+        Returns (first_number, missing) with ``missing`` the lowest gap below
+        the allocated numbers, or False. The UPDATE holds the counter row lock
+        until commit, so parallel creates never get the same number. A missing
+        counter is seeded with an upsert on the unique index; if a concurrent
+        transaction created it meanwhile, PostgreSQL raises a serialization
+        failure and the request is retried.
+        """
+        self.env['project.task'].flush_model(['name', 'project_id', 'parent_id', 'active'])
+        cr = self.env.cr
+        clause, params = self._key_clause(project_id, parent_id)
+        cr.execute(f"""
+            UPDATE project_task_code_counter
+               SET z_last_number = z_last_number + %s,
+                   write_uid = %s,
+                   write_date = now() at time zone 'UTC'
+             WHERE {clause}
+         RETURNING id, z_last_number, z_gap_numbers
+        """, [count, self.env.uid] + params)
+        row = cr.fetchone()
+        if row is None:
+            last_number, gaps = self._seed(project_id, parent_id, exclude_ids)
+            if parent_id:
+                conflict = "(z_parent_id) WHERE z_parent_id IS NOT NULL"
+            else:
+                conflict = "(z_project_id) WHERE z_parent_id IS NULL"
+            cr.execute(f"""
+                INSERT INTO project_task_code_counter
+                    (z_project_id, z_parent_id, z_last_number, z_gap_numbers,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, %s, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+                ON CONFLICT {conflict} DO UPDATE
+                   SET z_last_number = project_task_code_counter.z_last_number + %s,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+             RETURNING id, z_last_number, z_gap_numbers
+            """, [project_id or None, parent_id or None, last_number + count, self._format_gaps(gaps),
+                  self.env.uid, self.env.uid, count])
+            row = cr.fetchone()
+        counter_id, last_number, gap_numbers = row
+        self.browse(counter_id).invalidate_recordset()
+        gaps = self._parse_gaps(gap_numbers)
+        return last_number - count + 1, min(gaps) if gaps else False
+
+    @api.model
+    def _reset(self, keys):
+        """Hapus counter ``(project_id, parent_id)`` supaya di-seed ulang dari nama task.
+
+        Used when tasks change project / parent or are renumbered, so the
+        counter never lags behind the codes actually in use.
+        """
+        cr = self.env.cr
+        for project_id, parent_id in keys:
+            if not (project_id or parent_id):
+                continue
+            clause, params = self._key_clause(project_id, parent_id)
+            cr.execute(f"DELETE FROM project_task_code_counter WHERE {clause}", params)
+        self.invalidate_model()
+
+    @api.model
+    def _release(self, tasks):
+        """Kembalikan nomor task yang dihapus ke gap index counter-nya."""
+        released = {}
+        for task in tasks:
+            if task.parent_id:
+                key = (task.project_id.id, task.parent_id.id)
+                number = self._parse_number(task.name, task.parent_id.name or '')
+            else:
+                key = (task.project_id.id, False)
+                number = self._parse_number(task.name)
+            if number is not None and (key[0] or key[1]):
+                released.setdefault(key, set()).add(number)
+        cr = self.env.cr
+        for (project_id, parent_id), numbers in released.items():
+            clause, params = self._key_clause(project_id, parent_id)
+            cr.execute(f"""
+                SELECT id, z_last_number, z_gap_numbers
+                  FROM project_task_code_counter
+                 WHERE {clause}
+                   FOR UPDATE
+            """, params)
+            row = cr.fetchone()
+            if not row:
+                continue
+            counter_id, last_number, gap_numbers = row
+            existing = set(range(1, last_number + 1)) - self._parse_gaps(gap_numbers) - numbers
+            last_number = max(existing) if existing else 0
+            gaps = set(range(1, last_number)) - existing
+            cr.execute("""
+                UPDATE project_task_code_counter
+                   SET z_last_number = %s, z_gap_numbers = %s, write_uid = %s, write_date = now() at time zone 'UTC'
+                 WHERE id = %s
+            """, [last_number, self._format_gaps(gaps), self.env.uid, counter_id])
+            self.browse(counter_id).invalidate_recordset()
+
+
 class AccountAnalyticLine(models.Model):
     _name = 'account.analytic.line'
     _inherit = ['account.analytic.line', 'mail.thread', 'mail.activity.mixin']
 
-    @api.depends('z_timesheet_start_date', 'z_timesheet_end_date')
+    @api.depends('z_timesheet_start_date', 'z_timesheet_end_date', 'z_active_duration', 'z_segment_ids')
     def _compute_unit_amount(self):
         for line in self:
-            if line.z_timesheet_start_date and line.z_timesheet_end_date:
+            if line.z_timesheet_end_date and line.z_segment_ids:
+                # timer line: the closed segments are the only source of the duration
+                line.unit_amount = round(line.z_active_duration / 3600.0, 2)
+            elif line.z_timesheet_start_date and line.z_timesheet_end_date:
                 delta = line.z_timesheet_end_date - line.z_timesheet_start_date
                 total_seconds = delta.total_seconds()
-                if hasattr(line, 'z_pause_duration') and line.z_pause_duration:
+                if line.z_pause_duration:
                     total_seconds -= line.z_pause_duration
                 line.unit_amount = round(total_seconds / 3600.0, 2)
             else:
@@ -461,7 +831,49 @@ class AccountAnalyticLine(models.Model):
     z_pause_start_time = fields.Datetime(string='Pause Start Time', help="When the timer was last paused")
     z_pause_duration = fields.Float(string='Total Pause Duration (seconds)', default=0.0,
                                     help="Total time paused in seconds")
-    z_pause_log = fields.Text(string='Pause Log', help="Log of all pause/resume actions")
+    z_pause_log = fields.Text(string='Pause Log', help="Log of all pause/resume actions (legacy, diganti z_segment_ids)")
+    z_segment_ids = fields.One2many('account.analytic.line.segment', 'z_timesheet_id', string='Timer Segments')
+    z_active_duration = fields.Float(string='Active Duration (seconds)', default=0.0,
+                                     help="Total durasi segmen timer yang sudah selesai")
+    z_segment_start_date = fields.Datetime(string='Running Since', help="Mulai segmen timer yang sedang berjalan")
+
+    def init(self):
+        # registry timer aktif: maksimal satu line terbuka per employee + task
+        cr = self.env.cr
+        cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'account_analytic_line_z_running_timer_idx'")
+        if cr.fetchone():
+            return
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute("""
+                    CREATE UNIQUE INDEX account_analytic_line_z_running_timer_idx
+                        ON account_analytic_line (employee_id, task_id)
+                     WHERE z_timesheet_start_date IS NOT NULL AND z_timesheet_end_date IS NULL
+                """)
+        except psycopg2.errors.UniqueViolation:
+            _logger.warning("Duplicate running timers found, account_analytic_line_z_running_timer_idx "
+                            "is created without uniqueness. Stop the duplicates and upgrade the module again.")
+            cr.execute("""
+                CREATE INDEX account_analytic_line_z_running_timer_idx
+                    ON account_analytic_line (employee_id, task_id)
+                 WHERE z_timesheet_start_date IS NOT NULL AND z_timesheet_end_date IS NULL
+            """)
+
+    @api.model
+    def _get_running_timers(self, employee_id, task_ids=None):
+        """Timesheet line yang timernya masih jalan (atau pause) untuk employee.
+
+        The domain matches the predicate of the partial index created in
+        ``init`` so the lookup is a single index scan.
+        """
+        domain = [
+            ('employee_id', '=', employee_id),
+            ('z_timesheet_start_date', '!=', False),
+            ('z_timesheet_end_date', '=', False),
+        ]
+        if task_ids is not None:
+            domain.append(('task_id', 'in', task_ids if isinstance(task_ids, (list, tuple)) else [task_ids]))
+        return self.sudo().search(domain, order='id desc')
 
     def action_approve(self):
         self.z_state = 'approved'
@@ -482,45 +894,181 @@ class AccountAnalyticLine(models.Model):
 
         # NEW: Pause/Resume methods
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        # batch jobs set z_skip_master_tracking, lines are then created without chatter / tracking
+        tracking_context = self.env['project.master.tracking.mixin']._get_master_tracking_context()
+        lines = super(AccountAnalyticLine, self.with_context(**tracking_context)).create(vals_list).with_env(self.env)
+        running = lines.filtered(
+            lambda x: x.z_timesheet_start_date and not x.z_timesheet_end_date and not x.z_is_paused
+        )
+        running._timer_open_segment()
+        running._notify_timer('started')
+        return lines
+
+    def unlink(self):
+        # timesheet KPI figures are refreshed by the cron (see project.portfolio.kpi),
+        # a deleted line leaves no write_date behind so flag the rows as stale
+        self.env['project.portfolio.kpi']._mark_projects_stale(self.task_id.project_id)
+        return super().unlink()
+
+    def _notify_timer(self, event):
+        """Kirim status timer ke channel bus partner milik employee.
+
+        Backend widgets and portal pages subscribe to ``z_project.timer`` and
+        update themselves from the payload instead of reloading.
+        """
+        for line in self.filtered(lambda x: x.employee_id.user_id):
+            self.env['bus.bus']._sendone(line.employee_id.user_id.partner_id, 'z_project.timer', {
+                'event': event,
+                'timesheet_id': line.id,
+                'task_id': line.task_id.id,
+                'employee_id': line.employee_id.id,
+                'start_at': fields.Datetime.to_string(line.z_timesheet_start_date),
+                'segment_start': fields.Datetime.to_string(line.z_segment_start_date),
+                'active_duration': line.z_active_duration,
+                'paused': line.z_is_paused,
+            })
+
+    def _timer_open_segment(self, start=None):
+        """Buka segmen timer baru, default mulai dari z_timesheet_start_date."""
+        if not self:
+            return
+        self.env['account.analytic.line.segment'].sudo().create([{
+            'z_timesheet_id': line.id,
+            'z_start_date': start or line.z_timesheet_start_date,
+        } for line in self])
+        if start:
+            self.write({'z_segment_start_date': start})
+        else:
+            for line in self:
+                line.z_segment_start_date = line.z_timesheet_start_date
+
+    def _timer_close_segment(self, end):
+        """Tutup segmen yang sedang berjalan, z_active_duration = total segmen yang sudah selesai."""
+        running = self.filtered('z_segment_start_date')
+        if not running:
+            return
+        Segment = self.env['account.analytic.line.segment'].sudo()
+        Segment.search([
+            ('z_timesheet_id', 'in', running.ids),
+            ('z_end_date', '=', False),
+        ]).write({'z_end_date': end})
+        durations = dict(Segment._read_group(
+            [('z_timesheet_id', 'in', running.ids), ('z_end_date', '!=', False)],
+            ['z_timesheet_id'], ['z_duration:sum'],
+        ))
+        for line in running:
+            line.write({
+                'z_active_duration': durations.get(line, 0.0),
+                'z_segment_start_date': False,
+            })
+
     def action_pause_timer(self):
         """Pause the timer and record pause start time"""
         self.ensure_one()
         if not self.z_is_paused:
-            self.z_is_paused = True
-            self.z_pause_start_time = fields.Datetime.now()
-
-            # Log the pause action
-            log_entry = f"Paused at {self.z_pause_start_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            self.z_pause_log = (self.z_pause_log or '') + log_entry
-
+            now = fields.Datetime.now()
+            self._timer_close_segment(now)
+            self.write({
+                'z_is_paused': True,
+                'z_pause_start_time': now,
+                'unit_amount': round(self.z_active_duration / 3600.0, 2),
+            })
+            self._notify_timer('paused')
             return True
         return False
 
     def action_resume_timer(self):
         """Resume the timer and calculate pause duration"""
         self.ensure_one()
-        if self.z_is_paused and self.z_pause_start_time:
-            resume_time = fields.Datetime.now()
-            pause_duration = (resume_time - self.z_pause_start_time).total_seconds()
-
-            self.z_is_paused = False
-            self.z_pause_duration += pause_duration
-
-            # Log the resume action
-            log_entry = f"Resumed at {resume_time.strftime('%Y-%m-%d %H:%M:%S')} (paused for {pause_duration:.1f}s)\n"
-            self.z_pause_log = (self.z_pause_log or '') + log_entry
-
-            self.z_pause_start_time = False
+        if self.z_is_paused:
+            now = fields.Datetime.now()
+            pause_duration = (now - self.z_pause_start_time).total_seconds() if self.z_pause_start_time else 0.0
+            self.write({
+                'z_is_paused': False,
+                'z_pause_duration': self.z_pause_duration + pause_duration,
+                'z_pause_start_time': False,
+            })
+            self._timer_open_segment(now)
+            self._notify_timer('resumed')
             return True
         return False
 
+    def action_stop_timer(self, description=None):
+        """Stop the timers, returns the effective duration in hours (from the closed segments)"""
+        now = fields.Datetime.now()
+        self._timer_close_segment(now)
+        for line in self.filtered(lambda x: x.z_is_paused and x.z_pause_start_time):
+            line.z_pause_duration += (now - line.z_pause_start_time).total_seconds()
+        vals = {
+            'z_timesheet_end_date': now,
+            'z_is_paused': False,
+            'z_pause_start_time': False,
+        }
+        if description:
+            vals['name'] = description
+        self.write(vals)
+        self._notify_timer('stopped')
+        return sum(self.mapped('unit_amount'))
+
     def get_effective_duration(self):
         """Get the actual working duration excluding pause time"""
         self.ensure_one()
+        if self.z_timesheet_end_date and self.z_segment_ids:
+            return self.z_active_duration or 0
         if self.z_timesheet_start_date and self.z_timesheet_end_date:
             total_duration = (self.z_timesheet_end_date - self.z_timesheet_start_date).total_seconds()
             return total_duration - (self.z_pause_duration or 0)
-        return 0
+        running = (fields.Datetime.now() - self.z_segment_start_date).total_seconds() if self.z_segment_start_date else 0
+        return (self.z_active_duration or 0) + running
+
+    def _read_effective_durations(self):
+        """get_effective_duration untuk banyak line sekaligus, dalam satu query.
+
+        Returns {line_id: seconds}; ``sum(result.values())`` gives the total.
+        """
+        if not self.ids:
+            return {}
+        self.flush_recordset([
+            'z_timesheet_start_date', 'z_timesheet_end_date', 'z_pause_duration', 'z_active_duration',
+            'z_segment_start_date',
+        ])
+        self.env['account.analytic.line.segment'].flush_model(['z_timesheet_id'])
+        self.env.cr.execute("""
+            SELECT id,
+                   CASE WHEN z_timesheet_end_date IS NOT NULL
+                             AND EXISTS (SELECT 1 FROM account_analytic_line_segment segment
+                                          WHERE segment.z_timesheet_id = account_analytic_line.id)
+                        THEN COALESCE(z_active_duration, 0)
+                        WHEN z_timesheet_start_date IS NOT NULL AND z_timesheet_end_date IS NOT NULL
+                        THEN EXTRACT(EPOCH FROM z_timesheet_end_date - z_timesheet_start_date)
+                             - COALESCE(z_pause_duration, 0)
+                        ELSE COALESCE(z_active_duration, 0)
+                             + COALESCE(EXTRACT(EPOCH FROM (now() at time zone 'UTC') - z_segment_start_date), 0)
+                   END
+              FROM account_analytic_line
+             WHERE id IN %s
+        """, [tuple(self.ids)])
+        return {line_id: float(duration or 0.0) for line_id, duration in self.env.cr.fetchall()}
+
+
+class AccountAnalyticLineSegment(models.Model):
+    _name = "account.analytic.line.segment"
+    _description = "Timer Segment"
+    _order = "id asc"
+
+    z_timesheet_id = fields.Many2one('account.analytic.line', string='Timesheet', required=True, ondelete='cascade',
+                                     index=True)
+    z_start_date = fields.Datetime(string='Start', required=True)
+    z_end_date = fields.Datetime(string='End')
+    z_duration = fields.Float(string='Duration (seconds)', compute='_compute_duration', store=True)
+
+    @api.depends('z_start_date', 'z_end_date')
+    def _compute_duration(self):
+        for segment in self:
+            segment.z_duration = (segment.z_end_date - segment.z_start_date).total_seconds() \
+                if segment.z_end_date and segment.z_start_date else 0.0
 
 
 class AccountAnalyticLineRequest(models.Model):
@@ -571,7 +1119,7 @@ class AccountAnalyticLineRequest(models.Model):
 class ProjectTaskInvoicePlan(models.Model):
     _name = "project.task.invoice.plan"
     _description = "Invoice Plan"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin", "mail.thread", "mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id desc"
 
@@ -0,0 +1,14 @@
+from odoo import models
+from odoo.tools.sql import create_index
+
+
+class ResPartner(models.Model):
+
+    _inherit = "res.partner"
+
+    def init(self):
+        super().init()
+        # portal customer autocomplete, core only has a btree index on complete_name
+        if self.env.registry.has_trigram:
+            create_index(self.env.cr, 'res_partner_complete_name_z_trgm_index', self._table,
+                         ['complete_name gin_trgm_ops'], method='gin')
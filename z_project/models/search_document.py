@@ -0,0 +1,27 @@
+from odoo import api, models
+from odoo.tools import SQL
+
+
+class ProjectSearchDocumentMixin(models.AbstractModel):
+    _name = "project.search.document.mixin"
+    _description = "Portal Search Document"
+
+    # the model defines a stored ``z_search_document`` with index='trigram'
+
+    @api.model
+    def _get_search_document_domain(self, term):
+        return [('z_search_document', 'ilike', term)]
+
+    @api.model
+    def _search_ranked(self, domain, term, offset=0, limit=None, order=None):
+        """Search ``domain`` ordered by relevance (trigram similarity) to ``term``.
+
+        ``domain`` is expected to contain ``_get_search_document_domain(term)``.
+        Without pg_trgm the records are returned in ``order`` instead.
+        """
+        query = self._search(domain, offset=offset, limit=limit, order=order)
+        if self.env.registry.has_trigram:
+            document_sql = self._field_to_sql(self._table, 'z_search_document', query)
+            query.order = SQL("similarity(%s, %s) DESC, %s", document_sql, term,
+                              SQL.identifier(self._table, 'id'))
+        return self.browse(query)
@@ -5,7 +5,7 @@ class SeverityMaster(models.Model):
 
     _name = "severity.master"
     _description = "Severity Master"
-    _inherit = ["mail.thread","mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin","project.portal.master.data.mixin","mail.thread","mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id desc"
 
@@ -0,0 +1,303 @@
+import base64
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+
+import pytz
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_IMPORT_BATCH_SIZE = 200
+# kolom yang dikenali per jenis import, yang pertama wajib diisi
+IMPORT_COLUMNS = {
+    'tasks': (
+        'project', 'code', 'parent_code', 'master_task', 'technology', 'severity', 'regional',
+        'head_assignees', 'member_assignees', 'planned_start', 'planned_end', 'deadline', 'description',
+    ),
+    'timesheets': ('project', 'task', 'employee', 'start', 'end', 'date', 'description'),
+}
+IMPORT_REQUIRED_COLUMNS = {
+    'tasks': ('project',),
+    'timesheets': ('project', 'task', 'employee', 'start', 'end'),
+}
+# separator nama pada kolom assignees
+IMPORT_LIST_SEPARATOR = ';'
+# penanda nama master data yang dipakai lebih dari satu record
+AMBIGUOUS = object()
+
+
+class ProjectTaskImport(models.TransientModel):
+    _name = "project.task.import"
+    _description = "Import Tasks / Timesheets"
+
+    z_import_type = fields.Selection([
+        ('tasks', 'Tasks & Subtasks'),
+        ('timesheets', 'Timesheets'),
+    ], string='Import', required=True, default='tasks')
+    z_file = fields.Binary(string='CSV File', required=True)
+    z_filename = fields.Char(string='File Name')
+    z_batch_size = fields.Integer(string='Batch Size', default=lambda self: self._get_import_batch_size())
+    z_state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+    z_created_count = fields.Integer(string='Created', readonly=True)
+    z_error_count = fields.Integer(string='Errors', readonly=True)
+    z_error_log = fields.Text(string='Error Log', readonly=True)
+
+    @api.model
+    def _get_import_batch_size(self):
+        """Ukuran batch create, diatur lewat ``z_project.import_batch_size``."""
+        size = self.env['ir.config_parameter'].sudo().get_param('z_project.import_batch_size')
+        try:
+            return max(int(size), 1) if size else DEFAULT_IMPORT_BATCH_SIZE
+        except ValueError:
+            return DEFAULT_IMPORT_BATCH_SIZE
+
+    def action_import(self):
+        self.ensure_one()
+        stream = io.TextIOWrapper(io.BytesIO(base64.b64decode(self.z_file)), encoding='utf-8-sig', newline='')
+        result = self._import_stream(stream, self.z_import_type, self.z_batch_size)
+        self.write({
+            'z_state': 'done',
+            'z_created_count': result['created'],
+            'z_error_count': len(result['errors']),
+            'z_error_log': '\n'.join(_("Row %(row)s: %(message)s", row=row, message=message)
+                                     for row, message in result['errors']),
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    @api.model
+    def _import_stream(self, stream, import_type, batch_size=None, employee=None):
+        """Import CSV dari text stream, baris demi baris.
+
+        Rows are validated against the cached master data, created in batches
+        of ``batch_size`` and a failing row is reported without aborting the
+        rest of the file. Task rollups are recomputed once at the end. When
+        ``employee`` is given, timesheet rows can only be booked for them.
+
+        Returns ``{'created': int, 'errors': [(row_number, message)]}``.
+        """
+        if import_type not in IMPORT_COLUMNS:
+            raise UserError(_("Unknown import type %s.", import_type))
+        batch_size = max(int(batch_size or self._get_import_batch_size()), 1)
+        reader = csv.DictReader(stream)
+        headers = {(name or '').strip().lower() for name in reader.fieldnames or []}
+        required = IMPORT_REQUIRED_COLUMNS[import_type]
+        if employee:
+            required = tuple(name for name in required if name != 'employee')
+        missing = [name for name in required if name not in headers]
+        if missing:
+            raise UserError(_("Missing column(s): %s", ', '.join(missing)))
+
+        state = {
+            'import_type': import_type,
+            'lookups': self._get_import_lookups(),
+            'employee': employee,
+            'projects': {},
+            'tasks': {},
+            'pending_codes': set(),
+            'batch': [],
+            'created_ids': [],
+            'created': 0,
+            'errors': [],
+        }
+        prepare = self._prepare_task_vals if import_type == 'tasks' else self._prepare_timesheet_vals
+        # header is line 1
+        for row_number, raw in enumerate(reader, start=2):
+            row = {(key or '').strip().lower(): (value or '').strip() for key, value in raw.items() if key}
+            try:
+                vals, code = prepare(row, state)
+            except (UserError, ValidationError, ValueError) as e:
+                state['errors'].append((row_number, str(e.args[0] if e.args else e)))
+                continue
+            state['batch'].append((row_number, vals, code))
+            if code:
+                state['pending_codes'].add(code)
+            if len(state['batch']) >= batch_size:
+                self._import_flush_batch(state)
+        self._import_flush_batch(state)
+        if import_type == 'tasks' and state['created_ids']:
+            self._import_finalize_tasks(state['created_ids'])
+        return {'created': state['created'], 'errors': state['errors']}
+
+    @api.model
+    def _get_import_lookups(self):
+        """``{kind: {nama lower: id}}`` dari snapshot master data portal yang sudah di-cache.
+
+        A name shared by several records maps to ``AMBIGUOUS`` and is reported
+        as a row error instead of picking one of them.
+        """
+        payload = json.loads(self.env['project.portal.master.data']._get_master_data_payload()[1])
+        lookups = {}
+        for kind, rows in payload['data'].items():
+            names = lookups[kind] = {}
+            for row in rows:
+                if not row['name']:
+                    continue
+                key = row['name'].strip().lower()
+                names[key] = AMBIGUOUS if key in names else row['id']
+        return lookups
+
+    def _import_lookup(self, state, kind, value, label):
+        if not value:
+            return False
+        record_id = state['lookups'][kind].get(value.lower())
+        if record_id is AMBIGUOUS:
+            raise ValidationError(_("%(label)s '%(value)s' matches several records.", label=label, value=value))
+        if not record_id:
+            raise ValidationError(_("%(label)s '%(value)s' not found.", label=label, value=value))
+        return record_id
+
+    def _import_lookup_many(self, state, kind, value, label):
+        names = [name.strip() for name in value.split(IMPORT_LIST_SEPARATOR) if name.strip()]
+        return [self._import_lookup(state, kind, name, label) for name in names]
+
+    def _import_project(self, state, value):
+        key = value.lower()
+        if key not in state['projects']:
+            project = self.env['project.project'].search([('name', '=ilike', value)], limit=2)
+            state['projects'][key] = AMBIGUOUS if len(project) > 1 else project.id
+        if state['projects'][key] is AMBIGUOUS:
+            raise ValidationError(_("Project '%s' matches several projects.", value))
+        if not state['projects'][key]:
+            raise ValidationError(_("Project '%s' not found.", value))
+        return state['projects'][key]
+
+    def _import_task(self, state, project_id, code):
+        """Task berdasarkan kode T-xx / T-xx.yy, dari file ini atau yang sudah ada."""
+        key = (project_id, code.lower())
+        if key in state['pending_codes']:
+            # the referenced row is still waiting in the current batch
+            self._import_flush_batch(state)
+        if key not in state['tasks']:
+            task = self.env['project.task'].search([('project_id', '=', project_id), ('name', '=ilike', code)], limit=2)
+            state['tasks'][key] = AMBIGUOUS if len(task) > 1 else task.id
+        if state['tasks'][key] is AMBIGUOUS:
+            raise ValidationError(_("Task '%s' matches several tasks in the project.", code))
+        if not state['tasks'][key]:
+            raise ValidationError(_("Task '%s' not found in the project.", code))
+        return state['tasks'][key]
+
+    def _import_datetime(self, value, label):
+        """Tanggal/jam lokal user (``YYYY-MM-DD HH:MM[:SS]``) ke UTC naive."""
+        if not value:
+            return False
+        for date_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M'):
+            try:
+                local_dt = datetime.strptime(value, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValidationError(_("%(label)s '%(value)s' is not a valid date time.", label=label, value=value))
+        tz = pytz.timezone(self.env.user.tz or 'Asia/Jakarta')
+        return tz.localize(local_dt).astimezone(pytz.utc).replace(tzinfo=None)
+
+    def _import_date(self, value, label):
+        if not value:
+            return False
+        try:
+            return fields.Date.to_date(value)
+        except ValueError:
+            raise ValidationError(_("%(label)s '%(value)s' is not a valid date.", label=label, value=value))
+
+    def _prepare_task_vals(self, row, state):
+        project_id = self._import_project(state, row['project'])
+        vals = {
+            'project_id': project_id,
+            'z_master_task_id': self._import_lookup(state, 'master_tasks', row.get('master_task'), _("Master task")),
+            'z_technology_id': self._import_lookup(state, 'technologies', row.get('technology'), _("Technology")),
+            'z_severity_id': self._import_lookup(state, 'severities', row.get('severity'), _("Severity")),
+            'z_regional_id': self._import_lookup(state, 'regionals', row.get('regional'), _("Regional")),
+            'z_head_assignes_ids': [(6, 0, self._import_lookup_many(
+                state, 'employees', row.get('head_assignees', ''), _("Employee")))],
+            'z_member_assignes_ids': [(6, 0, self._import_lookup_many(
+                state, 'employees', row.get('member_assignees', ''), _("Employee")))],
+            'z_planned_start_date': self._import_date(row.get('planned_start'), _("Planned start")),
+            'z_planned_end_date': self._import_date(row.get('planned_end'), _("Planned end")),
+            'date_deadline': self._import_datetime(row.get('deadline'), _("Deadline")),
+            'z_description': row.get('description') or False,
+        }
+        if row.get('parent_code'):
+            vals['parent_id'] = self._import_task(state, project_id, row['parent_code'])
+        # the code of the file is only a reference for later rows, the real
+        # code is allocated by the task code counter
+        code = (project_id, row['code'].lower()) if row.get('code') else None
+        return vals, code
+
+    def _prepare_timesheet_vals(self, row, state):
+        project_id = self._import_project(state, row['project'])
+        if not row.get('task'):
+            raise ValidationError(_("Task is required."))
+        if not row.get('start') or not row.get('end'):
+            raise ValidationError(_("Start and end are required."))
+        start = self._import_datetime(row['start'], _("Start"))
+        end = self._import_datetime(row['end'], _("End"))
+        if end < start:
+            raise ValidationError(_("End is before start."))
+        employee = state['employee']
+        if employee:
+            # restricted import, rows can only be booked for this employee
+            employee_id = employee.id
+            if row.get('employee') and self._import_lookup(state, 'employees', row['employee'], _("Employee")) != employee_id:
+                raise ValidationError(_("You can only import your own timesheets."))
+        else:
+            employee_id = self._import_lookup(state, 'employees', row.get('employee'), _("Employee"))
+        if not employee_id:
+            raise ValidationError(_("Employee is required."))
+        vals = {
+            'project_id': project_id,
+            'task_id': self._import_task(state, project_id, row['task']),
+            'employee_id': employee_id,
+            'z_timesheet_start_date': start,
+            'z_timesheet_end_date': end,
+            'date': self._import_date(row.get('date'), _("Date")) or start.date(),
+            'name': row.get('description') or '/',
+        }
+        return vals, None
+
+    def _import_flush_batch(self, state):
+        """Create the pending rows at once, or one by one if the batch fails."""
+        batch, state['batch'] = state['batch'], []
+        state['pending_codes'] = set()
+        if not batch:
+            return
+        model_name = 'project.task' if state['import_type'] == 'tasks' else 'account.analytic.line'
+        Model = self.env[model_name].with_context(z_defer_rollup=True, z_skip_master_tracking=True)
+        try:
+            with self.env.cr.savepoint():
+                records = Model.create([vals for _row, vals, _code in batch])
+            created = list(zip(batch, records))
+        except Exception:
+            created = []
+            for item in batch:
+                try:
+                    with self.env.cr.savepoint():
+                        created.append((item, Model.create(item[1])))
+                except Exception as e:
+                    _logger.info("Import row %s failed: %s", item[0], e)
+                    state['errors'].append((item[0], str(e.args[0] if e.args else e)))
+        for (_row, _vals, code), record in created:
+            if code:
+                state['tasks'][code] = record.id
+            if model_name == 'project.task':
+                state['created_ids'].append(record.id)
+        state['created'] += len(created)
+
+    @api.model
+    def _import_finalize_tasks(self, task_ids):
+        """Rollup yang ditunda selama import, dihitung sekali untuk semua task baru."""
+        tasks = self.env['project.task'].browse(task_ids).exists()
+        tasks._getMandaysBudget()
+        tasks._getActualMandaysBudget()
+        tasks._getBobot()
+        tasks._propagate_progress()
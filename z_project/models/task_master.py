@@ -5,7 +5,7 @@ class TaskMaster(models.Model):
 
     _name = "task.master"
     _description = "Task Master"
-    _inherit = ["mail.thread","mail.activity.mixin"]
+    _inherit = ["project.master.tracking.mixin","project.portal.master.data.mixin","mail.thread","mail.activity.mixin"]
     _rec_name = "z_name"
     _order = "id desc"
 
@@ -17,6 +17,6 @@ class TaskMaster(models.Model):
             else:
                 this.z_complete_name = this.z_name
 
-    z_name = fields.Char(string="Master Task")
+    z_name = fields.Char(string="Master Task", index='trigram')
     z_parent_id = fields.Many2one('task.master',string="Parent Task")
     z_complete_name = fields.Char('Complete Name',compute=_getCompleteName,recursive=True,store=True)
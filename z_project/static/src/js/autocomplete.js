@@ -0,0 +1,43 @@
+/** @odoo-module */
+
+// Select dengan data-z-autocomplete="<kind>" mencari opsinya lewat
+// /portal/autocomplete/<kind>, hanya opsi yang terpilih yang dirender server.
+function init() {
+    // the portal pages ship their own jQuery + select2, use the page copy
+    const $ = window.jQuery;
+    if (!$ || !$.fn.select2) {
+        return;
+    }
+    $("select[data-z-autocomplete]").each(function () {
+        const $select = $(this);
+        const multiple = $select.prop("multiple");
+        const $modal = $select.closest(".modal");
+        $select.select2({
+            width: "100%",
+            allowClear: !multiple,
+            placeholder: "Select an option",
+            dropdownParent: $modal.length ? $modal : $(document.body),
+            ajax: {
+                url: "/portal/autocomplete/" + $select.data("z-autocomplete"),
+                dataType: "json",
+                delay: 250,
+                cache: true,
+                data: (params) => ({ term: params.term || "", page: params.page || 1 }),
+            },
+            templateResult: (data) => {
+                // hide options that are already selected
+                if (multiple && data.id && ($select.val() || []).includes(String(data.id))) {
+                    return null;
+                }
+                return data.text;
+            },
+        });
+    });
+}
+
+// after the inline page scripts initialised their own select2 widgets
+if (document.readyState === "complete") {
+    init();
+} else {
+    window.addEventListener("load", init);
+}
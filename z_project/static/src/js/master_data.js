@@ -0,0 +1,88 @@
+/** @odoo-module */
+
+// Mengisi <select data-z-master="..."> di portal dari snapshot /portal/master-data.
+// The snapshot is kept in localStorage and revalidated with its ETag, so the
+// options are only downloaded again after the master data changed.
+const STORAGE_KEY = "z_project.master_data";
+
+function readStored() {
+    try {
+        return JSON.parse(window.localStorage.getItem(STORAGE_KEY)) || null;
+    } catch {
+        return null;
+    }
+}
+
+async function loadMasterData() {
+    const stored = readStored();
+    const versionEl = document.getElementById("z_master_data_version");
+    const pageVersion = versionEl && versionEl.dataset.version;
+    if (stored && pageVersion && stored.version === pageVersion) {
+        return stored.data;
+    }
+    const headers = {};
+    if (stored && stored.version) {
+        headers["If-None-Match"] = `"${stored.version}"`;
+    }
+    const response = await fetch("/portal/master-data", { headers, credentials: "same-origin" });
+    if (response.status === 304 && stored) {
+        return stored.data;
+    }
+    if (!response.ok) {
+        throw new Error(`Master data request failed: ${response.status}`);
+    }
+    const payload = await response.json();
+    try {
+        window.localStorage.setItem(STORAGE_KEY, JSON.stringify(payload));
+    } catch {
+        // storage full or disabled, the browser HTTP cache still applies
+    }
+    return payload.data;
+}
+
+function parseSelected(select) {
+    const raw = select.dataset.zSelected;
+    if (!raw) {
+        return [];
+    }
+    try {
+        const value = JSON.parse(raw);
+        return (Array.isArray(value) ? value : [value]).map(String);
+    } catch {
+        return [];
+    }
+}
+
+function fillSelects(data) {
+    for (const select of document.querySelectorAll("select[data-z-master]")) {
+        const items = data[select.dataset.zMaster];
+        if (!items || select.dataset.zFilled) {
+            continue;
+        }
+        const selected = new Set(parseSelected(select));
+        const fragment = document.createDocumentFragment();
+        for (const item of items) {
+            const value = String(item.id);
+            fragment.appendChild(new Option(item.name || "Unnamed", value, false, selected.has(value)));
+        }
+        select.appendChild(fragment);
+        select.dataset.zFilled = "1";
+        if (selected.size) {
+            // native event so select2 (own jQuery copy on the page) refreshes too
+            select.dispatchEvent(new Event("change", { bubbles: true }));
+        }
+    }
+}
+
+function start() {
+    if (!document.querySelector("select[data-z-master]")) {
+        return;
+    }
+    loadMasterData().then(fillSelects).catch((error) => console.error(error));
+}
+
+if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", start);
+} else {
+    start();
+}
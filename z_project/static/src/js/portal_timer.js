@@ -0,0 +1,27 @@
+/** @odoo-module */
+import publicWidget from "@web/legacy/js/public/public_widget";
+
+// Meneruskan notifikasi timer dari bus ke halaman portal task sebagai
+// event ``z_project:timer``, tanpa perlu reload halaman.
+publicWidget.registry.ZProjectTaskTimer = publicWidget.Widget.extend({
+    selector: '#btnTimeStart',
+
+    start() {
+        this.busService = this.bindService("bus_service");
+        this.onTimerNotification = this.onTimerNotification.bind(this);
+        this.busService.subscribe("z_project.timer", this.onTimerNotification);
+        this.busService.start();
+        return this._super(...arguments);
+    },
+
+    destroy() {
+        if (this.busService) {
+            this.busService.unsubscribe("z_project.timer", this.onTimerNotification);
+        }
+        this._super(...arguments);
+    },
+
+    onTimerNotification(payload) {
+        $(document).trigger('z_project:timer', [payload]);
+    },
+});
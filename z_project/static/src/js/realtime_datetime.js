@@ -1,43 +1,72 @@
 /** @odoo-module **/
 import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
 import { standardFieldProps } from "@web/views/fields/standard_field_props";
 import { Component, useState, onMounted, onWillUnmount } from "@odoo/owl";
 
+const { DateTime } = luxon;
+
+function parseUtc(value) {
+    return value ? DateTime.fromSQL(value, { zone: "utc" }) : null;
+}
+
 class RealtimeDatetime extends Component {
     static template = "z_project.RealtimeDatetime";
     static props = standardFieldProps;
 
     setup() {
-        this.state = useState({ now: new Date() });
+        // timer state comes from the record and is kept up to date by bus
+        // notifications, the clock below only ticks locally
+        const data = this.props.record.data;
+        this.state = useState({
+            now: DateTime.now(),
+            segmentStart: data.z_timer_segment_start || null,
+            activeDuration: data.z_timer_active_duration || 0,
+            paused: Boolean(data.z_timer_paused),
+        });
+        this.busService = useService("bus_service");
+        this.onTimerNotification = this.onTimerNotification.bind(this);
         onMounted(() => {
+            this.busService.subscribe("z_project.timer", this.onTimerNotification);
             this.interval = setInterval(() => {
-                this.state.now = new Date(); // updated every 1 second
+                this.state.now = DateTime.now(); // updated every 1 second
             }, 1000);
         });
         onWillUnmount(() => {
+            this.busService.unsubscribe("z_project.timer", this.onTimerNotification);
             clearInterval(this.interval);
         });
     }
 
+    onTimerNotification(payload) {
+        if (payload.task_id !== this.props.record.resId) {
+            return;
+        }
+        this.state.activeDuration = payload.active_duration || 0;
+        this.state.paused = payload.paused;
+        if (payload.event === "stopped") {
+            this.state.segmentStart = null;
+            if (!this.props.record.dirty) {
+                this.props.record.load();
+            }
+        } else {
+            this.state.segmentStart = parseUtc(payload.segment_start);
+            if (payload.event === "started" && !this.props.record.dirty) {
+                this.props.record.load();
+            }
+        }
+    }
+
     get displayValue() {
-        const startStr = document.querySelector('div[name="z_time_start"] span')?.textContent.trim();
-        if (startStr) {
-            const [datePart, timePart] = startStr.split(" ");
-            const [month, day, year] = datePart.split("/").map(Number);
-            const [hours, minutes, seconds] = timePart.split(":").map(Number);
-            const start = new Date(year, month - 1, day, hours, minutes, seconds);
-            const now = this.state.now;
-            const diffSec = Math.floor((now - start) / 1000);
-            const totalHours = Math.floor(diffSec / 3600);
-            const mins = String(Math.floor((diffSec % 3600) / 60)).padStart(2, "0");
-            const secs = String(diffSec % 60).padStart(2, "0");
-            const totalHoursStr = String(totalHours).padStart(2, "0");
-            return `${totalHoursStr}:${mins}:${secs}`;
+        let diffSec = Math.floor(this.state.activeDuration);
+        if (this.state.segmentStart && !this.state.paused) {
+            diffSec += Math.floor(this.state.now.diff(this.state.segmentStart, "seconds").seconds);
         }
-        // fallback
-        const d = this.state.now;
-        const pad = (n) => (n < 10 ? "0" + n : n);
-        return `${pad(d.getHours())}:${pad(d.getMinutes())}:${pad(d.getSeconds())}`;
+        diffSec = Math.max(0, diffSec);
+        const totalHoursStr = String(Math.floor(diffSec / 3600)).padStart(2, "0");
+        const mins = String(Math.floor((diffSec % 3600) / 60)).padStart(2, "0");
+        const secs = String(diffSec % 60).padStart(2, "0");
+        return `${totalHoursStr}:${mins}:${secs}`;
     }
 }
 